@@ -0,0 +1,68 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth.hashers import make_password
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions, serializers
+from rest_framework.authtoken.admin import User
+from rest_framework.authtoken.models import Token
+
+from accounts import hashing
+from accounts.serilalizers import SignupSerializer, LoginSerializer
+from config.async_views import AsyncAPIView
+
+
+class AsyncSignupView(AsyncAPIView):
+    """
+    url : /accounts/signup
+    info : async version of views.SignupView (same request and response)
+        the password is hashed in the bounded hashing executor (see accounts.hashing),
+        503 when it is saturated
+    """
+    http_method_names = ["post"]
+    authentication_required = False
+
+    async def post(self, request):
+        serializer = SignupSerializer(data=self.parse_json(request))
+        # the unique username check queries the database
+        if not await sync_to_async(serializer.is_valid)():
+            raise exceptions.ValidationError(serializer.errors)
+        user = User(username=User.normalize_username(serializer.validated_data["username"]))
+        user.password = await hashing.executor.run(make_password, serializer.validated_data["password"])
+        await user.asave()
+        return self.json_response(SignupSerializer(user).data, status=201)
+
+
+class AsyncLoginView(AsyncAPIView):
+    """
+    url : /accounts/login
+    info : async version of rest_framework obtain_auth_token (same request and response)
+        the password is checked in the bounded hashing executor (see accounts.hashing),
+        503 when it is saturated
+    """
+    http_method_names = ["post"]
+    authentication_required = False
+
+    async def post(self, request):
+        serializer = LoginSerializer(data=self.parse_json(request))
+        serializer.is_valid(raise_exception=True)
+        username, password = serializer.validated_data["username"], serializer.validated_data["password"]
+
+        user = await User.objects.filter(username=username).afirst()
+        if user is None:
+            # hash anyway, so unknown usernames cannot be found by timing (like ModelBackend)
+            await hashing.executor.run(make_password, password)
+            raise self.invalid_credentials()
+        valid, upgraded = await hashing.executor.run(hashing.verify_password, password, user.password)
+        if not valid or not user.is_active:
+            raise self.invalid_credentials()
+        if upgraded:
+            user.password = upgraded
+            await user.asave(update_fields=["password"])
+
+        token, _ = await Token.objects.aget_or_create(user=user)
+        return self.json_response({"token": token.key})
+
+    @staticmethod
+    def invalid_credentials():
+        # same error as rest_framework AuthTokenSerializer
+        msg = _('Unable to log in with provided credentials.')
+        return serializers.ValidationError({"non_field_errors": [msg]}, code="authorization")
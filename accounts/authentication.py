@@ -0,0 +1,92 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches, DEFAULT_CACHE_ALIAS
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+
+
+def token_cache_key(key):
+    # the token itself is a secret, only its hash is stored in the cache key
+    return "auth-token:" + hashlib.sha256(key.encode()).hexdigest()
+
+
+def get_token_cache():
+    """
+    the cache of the token -> user resolutions, None if they should not be cached:
+    a per-process cache (locmem) can not be invalidated by the other worker processes, a token deleted
+    (logout) or a user deactivated in one worker would stay valid in the others until the timeout
+    """
+    cache = caches[DEFAULT_CACHE_ALIAS]
+    if settings.TOKEN_CACHE_TIMEOUT <= 0 or isinstance(cache, (LocMemCache, DummyCache)):
+        return None
+    return cache
+
+
+def invalidate_token(key):
+    if (cache := get_token_cache()) is not None:
+        cache.delete(token_cache_key(key))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    info :
+        Drop-in replacement of rest_framework TokenAuthentication.
+        The token -> user resolution is cached for settings.TOKEN_CACHE_TIMEOUT seconds,
+        so authenticated requests do not query authtoken_token and auth_user every time.
+        The cache entry is removed when the token is deleted (LogOutView) or the user is saved
+        (e.g. deactivated), see accounts.signals
+        Only a cache shared by the worker processes is used (see get_token_cache), without it
+        the token is read from the database like TokenAuthentication does
+    headers =
+        Authorization : Token <token>
+    """
+
+    def authenticate_credentials(self, key):
+        cache = get_token_cache()
+        if cache is None:
+            return super(CachedTokenAuthentication, self).authenticate_credentials(key)
+        cache_key = token_cache_key(key)
+        credentials = cache.get(cache_key)
+        if credentials is None:
+            # raises AuthenticationFailed for unknown tokens and inactive users, these are not cached
+            credentials = super(CachedTokenAuthentication, self).authenticate_credentials(key)
+            cache.set(cache_key, credentials, settings.TOKEN_CACHE_TIMEOUT)
+        return credentials
+
+    async def aauthenticate(self, request):
+        """
+        async version of authenticate() for async (non DRF) views, request is a django HttpRequest
+        returns (user, token) or None if there is no token, raises AuthenticationFailed for a bad token
+        """
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed(_("Invalid token header."))
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed(_("Invalid token header."))
+        return await self.aauthenticate_credentials(key)
+
+    async def aauthenticate_credentials(self, key):
+        # async version of authenticate_credentials()
+        cache = get_token_cache()
+        cache_key = token_cache_key(key)
+        credentials = None if cache is None else await cache.aget(cache_key)
+        if credentials is None:
+            model = self.get_model()
+            try:
+                token = await model.objects.select_related("user").aget(key=key)
+            except model.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_("Invalid token."))
+            if not token.user.is_active:
+                raise exceptions.AuthenticationFailed(_("User inactive or deleted."))
+            credentials = (token.user, token)
+            if cache is not None:
+                await cache.aset(cache_key, credentials, settings.TOKEN_CACHE_TIMEOUT)
+        return credentials
@@ -0,0 +1,54 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from rest_framework.exceptions import APIException
+
+
+class PasswordHashingBusy(APIException):
+    """
+    raised when the password hashing executor is saturated (503, the client can retry later)
+    """
+    status_code = 503
+    default_detail = "Too many login or signup requests, try again later."
+    default_code = "password_hashing_busy"
+    wait = 1  # seconds, sent as Retry-After
+
+
+class BoundedExecutor:
+    """
+    info :
+        Thread pool for the (deliberately slow) password hashing of the async login/signup views.
+        At most max_workers hashes run at once and max_pending wait for a thread, more requests fail
+        fast with PasswordHashingBusy instead of queueing, so an auth burst cannot starve other requests.
+        The functions run in the pool should not use the database.
+    usage :
+        encoded = await executor.run(make_password, raw_password)
+    """
+
+    def __init__(self, max_workers, max_pending):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hashing")
+        self.slots = threading.BoundedSemaphore(max_workers + max_pending)
+
+    async def run(self, func, *args):
+        if not self.slots.acquire(blocking=False):
+            raise PasswordHashingBusy()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        finally:
+            self.slots.release()
+
+
+def verify_password(raw_password, encoded):
+    """
+    returns (is the password correct, new hash if the hash algorithm/iterations should be upgraded else None)
+    like User.check_password() but without saving the user, so it can run in the executor
+    """
+    upgraded = []
+    valid = check_password(raw_password, encoded, setter=lambda raw: upgraded.append(make_password(raw)))
+    return valid, upgraded[0] if upgraded else None
+
+
+executor = BoundedExecutor(settings.PASSWORD_HASHING_WORKERS, settings.PASSWORD_HASHING_QUEUE)
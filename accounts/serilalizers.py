@@ -22,3 +22,14 @@ class SignupSerializer(serializers.ModelSerializer):
             password=validated_data["password"]  # saves password in hashes
         )
         return user
+
+
+class LoginSerializer(serializers.Serializer):
+    """
+    info: serializer for the login credentials of the async login view,
+        same fields as rest_framework AuthTokenSerializer (the password is checked by the view)
+    selected_fields = username , password
+    """
+
+    username = serializers.CharField()
+    password = serializers.CharField(trim_whitespace=False)
@@ -0,0 +1,19 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.admin import User
+from rest_framework.authtoken.models import Token
+
+from accounts.authentication import invalidate_token
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    # logout (LogOutView) or user deletion
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_tokens(sender, instance, **kwargs):
+    # the cached user may be deactivated or changed
+    for key in Token.objects.filter(user=instance).values_list("key", flat=True):
+        invalidate_token(key)
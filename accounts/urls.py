@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.urls import path
 from rest_framework.authtoken.views import obtain_auth_token
 
+from accounts.async_views import AsyncLoginView, AsyncSignupView
 from accounts.views import LogOutView, SignupView
 
 urlpatterns = [
@@ -8,4 +10,12 @@ urlpatterns = [
     path('login', obtain_auth_token, name="login"),
     path('logout', LogOutView.as_view(), name="logout"),
     path('signup', SignupView.as_view(), name="signup")
-]
\ No newline at end of file
+]
+
+if settings.ASYNC_VIEWS:
+    # password hashing in a bounded executor (see accounts.hashing)
+    urlpatterns = [
+        path('login', AsyncLoginView.as_view(), name="login"),
+        path('logout', LogOutView.as_view(), name="logout"),
+        path('signup', AsyncSignupView.as_view(), name="signup")
+    ]
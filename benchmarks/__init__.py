@@ -0,0 +1,5 @@
+"""
+Endpoint benchmarks of the api, run with:
+    python -m benchmarks.run --sizes 1000,100000 --output benchmark.json
+see benchmarks.run
+"""
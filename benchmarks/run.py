@@ -0,0 +1,248 @@
+"""
+info :
+    Reproducible endpoint benchmarks: seeds one user per size (number of transactions, same random seed on
+    every run) and drives the endpoints through the django test client, with the middlewares, authentication
+    and serialization of a real request. For every scenario it reports latency percentiles, throughput and
+    the number of database queries per request.
+    The benchmarks run on a test database (test_<NAME>), the data of the configured database is not touched.
+usage :
+    python -m benchmarks.run --sizes 1000,100000,1000000 --output benchmark.json
+    python -m benchmarks.run --save-baseline benchmarks/baseline.json        # before a change
+    python -m benchmarks.run --baseline benchmarks/baseline.json --threshold 0.2   # after it, exit code 1 on regression
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+
+PAGE_SIZE = 100
+SEED = 1
+START_DATE = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+DAYS = 3 * 365
+
+# name : query params of transaction/ (one scenario per filtering lookup of Transaction, plus ordering),
+# a None category is replaced with the id of the first benchmark category
+LIST_SCENARIOS = {
+    "list": {},
+    "list type": {"type": "E"},
+    "list category": {"category": None},
+    "list amount__lt": {"amount__lt": 500},
+    "list amount__gt": {"amount__gt": 500},
+    "list date__lt": {"date__lt": "2021-01-01T00:00:00Z"},
+    "list date__gt": {"date__gt": "2022-01-01T00:00:00Z"},
+    "list order_by=date": {"order_by": "date"},
+    "list order_by=amount": {"order_by": "amount"},
+}
+
+REPORT_SCENARIOS = {
+    "report": {},
+    "report date range": {"date__gt": "2020-06-15T00:00:00Z", "date__lt": "2021-06-15T00:00:00Z"},
+}
+
+
+def percentile(values, percent):
+    # nearest-rank percentile
+    ordered = sorted(values)
+    return ordered[max(0, -(-len(ordered) * percent // 100) - 1)]
+
+
+def seed_transactions(user, count, categories, batch_size=10000):
+    # deterministic transactions of the user, created with one balance/summary update per batch
+    from cash_managemnet.models import Transaction
+
+    rnd = random.Random(f"{SEED}:{count}")
+    for start in range(0, count, batch_size):
+        Transaction.bulk_insert([
+            Transaction(user=user, amount=rnd.randint(1, 1000), type=rnd.choice("IE"),
+                        category=rnd.choice(categories),
+                        date=START_DATE + datetime.timedelta(seconds=rnd.randint(0, DAYS * 86400)))
+            for _ in range(min(batch_size, count - start))
+        ], batch_size=batch_size)
+
+
+class Benchmark:
+    """
+    info :
+        Runs the scenarios of the endpoints for one user with `size` transactions
+    usage :
+        Benchmark(size=1000, iterations=20).run()  =>  {"list": {"p50_ms": .., "p95_ms": .., ...}, ...}
+    """
+
+    def __init__(self, size, iterations):
+        from django.test import Client
+        from rest_framework.authtoken.admin import User
+        from rest_framework.authtoken.models import Token
+
+        from cash_managemnet.models import Category, Transaction, rebuild_user_data
+
+        self.size, self.iterations = size, iterations
+        self.user, _ = User.objects.get_or_create(username=f"benchmark-{size}")
+        categories = list(Category.objects.order_by("id")[:5]) or \
+            Category.objects.bulk_create([Category(name=f"benchmark {index}") for index in range(5)])
+        existing = Transaction.objects.filter(user=self.user).count()
+        if existing != size:  # a kept database (--keepdb) is only seeded once
+            # a queryset delete does not go through Transaction.delete(), the balance and monthly summaries
+            # of the user are rebuilt (empty) before the new transactions are added to them
+            Transaction.objects.filter(user=self.user).delete()
+            rebuild_user_data([self.user.id])
+            seed_transactions(self.user, size, categories)
+        self.category = categories[0].id
+        token, _ = Token.objects.get_or_create(user=self.user)
+        self.client = Client(headers={"Authorization": f"Token {token.key}", "Content-Type": "application/json"})
+
+    def measure(self, request, setup=None):
+        # request(iteration) -> response, setup(iteration) runs before it and is not timed
+        # iteration -1 is a warm-up request (not timed)
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        if setup:
+            setup(-1)
+        request(-1)
+        durations, queries, statuses = [], [], set()
+        for iteration in range(self.iterations):
+            if setup:
+                setup(iteration)
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                response = request(iteration)
+                durations.append(time.perf_counter() - start)
+            queries.append(len(context.captured_queries))
+            statuses.add(response.status_code)
+        return {
+            "p50_ms": round(percentile(durations, 50) * 1000, 3),
+            "p95_ms": round(percentile(durations, 95) * 1000, 3),
+            "mean_ms": round(statistics.mean(durations) * 1000, 3),
+            "throughput_rps": round(len(durations) / sum(durations), 1),
+            "queries": max(queries),
+            "status": sorted(statuses),
+        }
+
+    def run(self):
+        from django.core.cache import cache
+        from django.urls import reverse
+
+        results = {}
+        # ids of the inserted transactions, created[0] is the one of the warm-up insert,
+        # the warm-up update and delete (iteration -1) use created[-1]
+        created = []
+
+        def insert(iteration):
+            response = self.client.post(reverse("insert-transaction"), {
+                "amount": 100 + iteration, "type": "IE"[iteration % 2], "category": self.category,
+                "date": "2021-03-03T10:00:00Z"}, content_type="application/json")
+            created.append(response.json()["id"])
+            return response
+
+        results["insert-transaction"] = self.measure(insert)
+        results["update-transaction"] = self.measure(lambda iteration: self.client.patch(
+            reverse("update-transaction", args=[created[iteration]]), {"amount": 50 + iteration, "type": "E"},
+            content_type="application/json"))
+        results["delete-transaction"] = self.measure(
+            lambda iteration: self.client.delete(reverse("delete-transaction", args=[created[iteration]])))
+
+        for name, params in LIST_SCENARIOS.items():
+            params = dict(params, page_size=PAGE_SIZE)
+            if "category" in params and params["category"] is None:
+                params["category"] = self.category
+            results[name] = self.measure(lambda iteration: self.client.get(reverse("all-transaction"), params))
+        for name, params in REPORT_SCENARIOS.items():
+            # without the report cache, else only the first iteration would compute the report
+            results[name] = self.measure(lambda iteration: self.client.get(reverse("report"), params),
+                                         setup=lambda iteration: cache.clear())
+        return results
+
+
+def run_benchmarks(sizes, iterations, log=None):
+    results = {}
+    for size in sizes:
+        start = time.perf_counter()
+        for name, result in Benchmark(size, iterations).run().items():
+            results[f"{size}/{name}"] = result
+        if log:
+            log(f"{size} transactions: {time.perf_counter() - start:.1f}s")
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    returns the regressions of results compared to baseline (both {"<size>/<scenario>": result}):
+        p50 or p95 latency more than `threshold` (0.2 = 20%) slower, or more database queries
+    """
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        base = baseline[key]
+        for metric in ["p50_ms", "p95_ms"]:
+            if result[metric] > base[metric] * (1 + threshold):
+                regressions.append(f"{key}: {metric} {base[metric]} -> {result[metric]}")
+        if result["queries"] > base["queries"]:
+            regressions.append(f"{key}: queries {base['queries']} -> {result['queries']}")
+    return regressions
+
+
+def environment():
+    import django
+    from django.db import connection
+
+    return {
+        "date": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "database": connection.vendor,
+        "machine": platform.machine(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks of the api endpoints")
+    parser.add_argument("--sizes", default="1000,100000",
+                        help="comma separated numbers of transactions of the benchmark users (e.g. 1000,100000,1000000)")
+    parser.add_argument("--iterations", type=int, default=20, help="requests per scenario")
+    parser.add_argument("--output", help="json file for the results")
+    parser.add_argument("--baseline", help="json results to compare with, exit code 1 on regression")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed latency increase (0.2 = 20%%)")
+    parser.add_argument("--save-baseline", help="also write the results to this baseline file")
+    parser.add_argument("--keepdb", action="store_true", help="keep the test database (and its seeded data)")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    import django
+    django.setup()
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment(debug=False)
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=args.keepdb)
+    try:
+        sizes = [int(size) for size in args.sizes.split(",")]
+        report = {"environment": environment(), "iterations": args.iterations,
+                  "results": run_benchmarks(sizes, args.iterations, log=lambda line: print(line, file=sys.stderr))}
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=args.keepdb)
+
+    for key, result in report["results"].items():
+        print(f"{key:40} p50 {result['p50_ms']:>9}ms  p95 {result['p95_ms']:>9}ms  "
+              f"{result['throughput_rps']:>8} req/s  {result['queries']:>3} queries  {result['status']}")
+    for path in filter(None, [args.output, args.save_baseline]):
+        with open(path, "w") as file:
+            json.dump(report, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(report["results"], json.load(file)["results"], args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CashManagemnetConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'cash_managemnet'
+
+    def ready(self):
+        # connects the transactions_changed receiver publishing to the event streams
+        from cash_managemnet import events  # noqa: F401
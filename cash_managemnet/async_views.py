@@ -0,0 +1,223 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, StreamingHttpResponse
+from rest_framework import exceptions
+from rest_framework.request import Request
+
+from cash_managemnet.mixins import TransactionFilterMixin, SparseFieldsMixin, TransactionExportMixin, make_etag, \
+    etag_matches
+from cash_managemnet.models import Transaction, Balance, MonthlySummary
+from cash_managemnet.pagination import TransactionCursorPagination
+from cash_managemnet.serializers import TransactionSerializer, TransactionRowSerializer
+from cash_managemnet.views import GenerateReportMonthly, BalanceView
+from config.async_views import AsyncAPIView
+from config.events import get_broker
+from config.fast_json import FastJSONRenderer
+
+
+class AsyncUserDataView(AsyncAPIView):
+    """
+    info :
+        Base of the async views returning data of the authenticated user.
+        conditional GET with the same ETag as the DRF views (see mixins.ConditionalGetMixin)
+    """
+
+    async def handle(self, request, *args, **kwargs):
+        self.data_version = await self.get_data_version(request)
+        etag = self.get_etag(request)
+        if etag is not None and etag_matches(request, etag):
+            response = HttpResponse(status=304)
+        else:
+            response = await super().handle(request, *args, **kwargs)
+        if etag is not None and response.status_code in (200, 304):
+            response["ETag"] = etag
+        return response
+
+    async def get_data_version(self, request):
+        return await Balance.aget_version(request.user.id)
+
+    def get_etag(self, request):
+        # None: no conditional GET
+        return make_etag(request.user.id, self.data_version, request.get_full_path(), self.media_type)
+
+
+class AsyncGetTransactionView(SparseFieldsMixin, AsyncUserDataView):
+    """
+    url : /transaction/<int:pk>
+    info : async version of views.GetTransactionView (same request and response)
+    """
+
+    async def get(self, request, pk):
+        try:
+            transaction = await self.sparse_queryset(Transaction.objects.filter(user=request.user)).aget(pk=pk)
+        except Transaction.DoesNotExist:
+            raise exceptions.NotFound()
+        return self.json_response(TransactionSerializer(transaction, fields=self.get_sparse_fields()).data)
+
+
+class AsyncGetAllTransactionView(TransactionFilterMixin, SparseFieldsMixin, AsyncUserDataView):
+    """
+    url : /transaction
+    info : async version of views.GetAllTransactionView (same query params, pagination and response)
+    """
+
+    fast_serialization = True  # see views.GetAllTransactionView
+
+    async def get(self, request):
+        queryset = self.filter_queryset(Transaction.objects.filter(user=request.user))
+        fields = self.get_sparse_fields()
+        if self.fast_serialization:
+            queryset = TransactionRowSerializer.get_rows(queryset, fields)
+        else:
+            queryset = self.sparse_queryset(queryset)
+        paginator = TransactionCursorPagination()
+        page_queryset = paginator.get_page_queryset(queryset, Request(request))
+        rows = paginator.get_page([row async for row in page_queryset])
+        if self.fast_serialization:
+            data = TransactionRowSerializer(rows, fields).data
+        else:
+            data = TransactionSerializer(rows, many=True, fields=fields).data
+        response = self.json_response(data)
+        if next_url := paginator.get_next_link():
+            response["Link"] = f'<{next_url}>; rel="next"'
+        return response
+
+
+class AsyncGenerateReportMonthly(AsyncUserDataView):
+    """
+    url : /report
+    info : async version of views.GenerateReportMonthly (same query params, cache and response)
+    """
+
+    async def get(self, request):
+        filter_lookups = GenerateReportMonthly.get_filter_lookups(request.GET)
+        cache_key = GenerateReportMonthly.get_cache_key(request.user.id, self.data_version, filter_lookups)
+        transactions = await cache.aget(cache_key)
+        if transactions is None:
+            transactions = await MonthlySummary.areport(request.user.id, **filter_lookups)
+            await cache.aset(cache_key, transactions, settings.REPORT_CACHE_TIMEOUT)
+        return self.json_response(transactions)
+
+
+class AsyncBalanceView(AsyncUserDataView):
+    """
+    url : /balance
+    info : async version of views.BalanceView (same query params and response)
+    """
+
+    async def get_data_version(self, request):
+        # the amount is read with the data version, in the same query
+        self.balance = await Balance.objects.filter(user_id=request.user.id).values("amnt", "version").afirst() \
+            or {"amnt": 0, "version": 0}
+        return self.balance["version"]
+
+    def get_etag(self, request):
+        if BalanceView.is_verify(request):
+            return None
+        return super().get_etag(request)
+
+    async def get(self, request):
+        data = dict(self.balance)
+        if BalanceView.is_verify(request):
+            if not request.user.is_staff:
+                raise exceptions.PermissionDenied("verify is only available to admin users")
+            expected = await sync_to_async(Balance(user_id=request.user.id).compute_balance_amount)()
+            data["verify"] = BalanceView.verify(data["amnt"], expected)
+        return self.json_response(data)
+
+
+class AsyncExportTransactionView(TransactionExportMixin, AsyncAPIView):
+    """
+    url : /export-transaction
+    info : async version of views.ExportTransactionView (same query params and file).
+        Under ASGI django reads a sync streaming iterator whole before sending it, here the rows are read
+        with the async ORM in chunks and sent while they are read, so the memory stays constant.
+    """
+
+    async def get(self, request):
+        export_format = self.get_export_format()
+        rows = self.get_rows().aiterator(chunk_size=self.chunk_size)
+        return self.streaming_response(self.lines(rows, *self.get_line_format(export_format)), export_format)
+
+    async def lines(self, rows, first_line, format_row):
+        # same chunks as views.ExportTransactionView.lines()
+        lines = [first_line] if first_line else []
+        async for row in rows:
+            lines.append(format_row(row))
+            if len(lines) >= self.chunk_size:
+                yield b"".join(lines)
+                lines = []
+        if lines:
+            yield b"".join(lines)
+
+
+class AsyncTransactionEventsView(AsyncAPIView):
+    """
+    url : /events
+    info : Server-Sent Events stream of the changes of the transactions and the balance of the user,
+        instead of polling /transaction and /report (for ASGI deployments, the stream stays on the event loop)
+            event: transaction   data: {"action": "created" or "updated", "transaction": {"id": 1, ...}}
+                                       {"action": "deleted", "id": 7}
+            event: balance       data: {"amnt": 300, "version": 12}    (id: 12)
+            event: resync        data: {}    events were missed, read /sync-transaction and /report again
+        -the stream starts with the current balance, a client reconnecting with an old Last-Event-ID gets resync
+        -the events are published by the writes once committed (see cash_managemnet.events), through
+            settings.EVENTS_BACKEND so the writes of the other workers are streamed too
+        -an idle stream sends a comment every settings.EVENTS_HEARTBEAT seconds and the stream is closed after
+            settings.EVENTS_STREAM_TIMEOUT seconds (EventSource reconnects by itself)
+    headers =
+        Authorization : Token <token>
+        Last-Event-ID : <version> (optional, sent by EventSource when it reconnects)
+    method: GET
+    response: text/event-stream
+        event: balance
+        id: 12
+        data: {"amnt":300,"version":12}
+    """
+    renderer = FastJSONRenderer()
+
+    async def get(self, request):
+        subscription = get_broker().subscribe(request.user.id)
+        stream = self.stream(subscription, request.headers.get("Last-Event-ID"))
+        # X-Accel-Buffering: the events are not buffered by nginx
+        return StreamingHttpResponse(stream, content_type="text/event-stream",
+                                     headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    def event(self, event, data, id=None):
+        head = f"event: {event}\n" if id is None else f"event: {event}\nid: {id}\n"
+        return head.encode() + b"data: " + self.renderer.render(data) + b"\n\n"
+
+    async def stream(self, subscription, last_event_id):
+        async with subscription:
+            # read after subscribing, so the writes committed meanwhile are not missed
+            balance = await Balance.objects.filter(user_id=subscription.user_id).values(
+                "amnt", "version").afirst() or {"amnt": 0, "version": 0}
+            first_version = version = balance["version"]
+            if last_event_id is not None and last_event_id != str(version):
+                yield self.event("resync", {})
+            yield self.event("balance", balance, version)
+
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + settings.EVENTS_STREAM_TIMEOUT
+            while (remaining := deadline - loop.time()) > 0:
+                message = await subscription.get(timeout=min(settings.EVENTS_HEARTBEAT, remaining))
+                if subscription.overflowed:
+                    subscription.clear()
+                    yield self.event("resync", {})
+                    continue
+                if message is None:
+                    yield b": keep-alive\n\n"
+                    continue
+                if message.get("version", first_version + 1) <= first_version:
+                    continue  # already in the first balance
+                if message.get("resync"):
+                    yield self.event("resync", {})
+                for change in message.get("transactions", ()):
+                    yield self.event("transaction", change)
+                # the messages of concurrent writes may arrive out of order, the balance only moves forward
+                if message.get("version", 0) > version:
+                    version = message["version"]
+                    yield self.event("balance", {"amnt": message["balance"], "version": version}, version)
@@ -0,0 +1,53 @@
+from collections import defaultdict
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.dispatch import receiver
+
+from cash_managemnet.models import transactions_changed
+from cash_managemnet.serializers import TransactionSerializer
+from config.events import get_broker
+
+
+def build_messages(balances, created, updated, deleted):
+    """
+    messages of a write for the event streams of the users (see async_views.AsyncTransactionEventsView):
+        {user_id: {"version": 12, "balance": 300,
+                   "transactions": [{"action": "created", "transaction": {...}}, {"action": "deleted", "id": 7}]}}
+    more than settings.EVENTS_MAX_TRANSACTIONS transactions (e.g. a large bulk insert) are replaced by
+    "resync": true, the client reads them from /sync-transaction
+    """
+    changes = defaultdict(list)
+    for user_id, transaction_id in deleted:
+        changes[user_id].append(("deleted", transaction_id))
+    for action, transactions in [("created", created), ("updated", updated)]:
+        for transact in transactions:
+            changes[transact.user_id].append((action, transact))
+
+    messages = {}
+    for user_id, balance in balances.items():
+        message = {"version": balance.version, "balance": balance.amnt}
+        if len(changes[user_id]) > settings.EVENTS_MAX_TRANSACTIONS:
+            message["resync"] = True
+        else:
+            message["transactions"] = [
+                {"action": action, "id": transact} if action == "deleted" else
+                {"action": action, "transaction": TransactionSerializer(transact).data}
+                for action, transact in changes[user_id]
+            ]
+        messages[user_id] = message
+    return messages
+
+
+def publish(messages):
+    broker = get_broker()
+    for user_id, message in messages.items():
+        broker.publish(user_id, message)
+
+
+@receiver(transactions_changed)
+def publish_transaction_changes(sender, balances, created, updated, deleted, **kwargs):
+    # the messages are built now (the instances may change later) and published once the write is committed
+    if balances:
+        transaction.on_commit(partial(publish, build_messages(balances, created, updated, deleted)), robust=True)
@@ -0,0 +1,116 @@
+import csv
+import io
+import json
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from rest_framework import serializers
+from rest_framework.authtoken.admin import User
+
+from cash_managemnet.models import Transaction, Category, Balance, rebuild_user_data
+from cash_managemnet.serializers import TransactionSerializer
+
+
+class CachedCategoryField(serializers.PrimaryKeyRelatedField):
+    """
+    category field of TransactionSerializer, the categories are fetched once per import
+    (cached in context["categories"]) instead of once per row
+    """
+
+    def to_internal_value(self, data):
+        categories = self.context["categories"]
+        if data not in categories:
+            categories[data] = super().to_internal_value(data)
+        return categories[data]
+
+
+class ImportTransactionSerializer(TransactionSerializer):
+    """
+    info: TransactionSerializer (same validation rules) for imported rows
+    """
+    category = CachedCategoryField(queryset=Category.objects.all(), allow_null=True, required=False)
+
+
+class Command(BaseCommand):
+    """
+    info : imports the transactions of a user from a csv or ndjson file (e.g. a bank statement)
+        -rows are validated like /insert-transaction (TransactionSerializer)
+        -rows are inserted in batches with bulk_create (COPY on PostgreSQL)
+        -the balance and monthly summaries of the user are rebuilt once at the end
+        -the imported transactions share one change sequence (Transaction.seq), the new data version of the user
+        -the import is atomic, if a row is invalid nothing is imported
+    file :
+        csv: header row with amount,type,category,date (category and date are optional, other columns are ignored)
+        ndjson: one json object per line, e.g {"amount": 200, "type": "E", "category": 1, "date": "2023-08-18T16:32:59Z"}
+    usage :
+        python manage.py import_transactions statement.csv --user keyvan
+        python manage.py import_transactions statement.ndjson --user keyvan --batch-size 10000
+    """
+    help = "Import transactions of a user from a csv or ndjson file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("file", help="path of the csv or ndjson file")
+        parser.add_argument("--user", required=True, help="username of the owner of the transactions")
+        parser.add_argument("--format", choices=["csv", "ndjson"],
+                            help="file format (default: guessed from the file extension)")
+        parser.add_argument("--batch-size", type=int, default=5000, help="rows inserted per query")
+        parser.add_argument("--no-copy", action="store_true", help="use bulk_create on PostgreSQL too")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["user"])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']} does not exist")
+        file_format = options["format"] or ("csv" if options["file"].endswith(".csv") else "ndjson")
+        use_copy = connection.vendor == "postgresql" and not options["no_copy"]
+        context = {"categories": {}}
+
+        count = 0
+        with open(options["file"], newline="") as file, transaction.atomic():
+            seq = Balance.next_version(user.id)
+            rows = self.read_rows(file, file_format)
+            while batch := list(islice(rows, options["batch_size"])):
+                transactions = [self.validate(user, seq, line, row, context) for line, row in batch]
+                if use_copy:
+                    self.copy(transactions)
+                else:
+                    Transaction.objects.bulk_create(transactions)
+                count += len(transactions)
+            rebuild_user_data([user.id])
+        self.stdout.write(self.style.SUCCESS(f"{count} transactions imported for {user.username}"))
+
+    def read_rows(self, file, file_format):
+        # yields (line number, row dict), empty csv cells are treated as missing values
+        if file_format == "csv":
+            reader = csv.DictReader(file)
+            for row in reader:
+                yield reader.line_num, {key: value for key, value in row.items() if value != ""}
+            return
+        for line, text in enumerate(file, start=1):
+            if text.strip():
+                try:
+                    yield line, json.loads(text)
+                except ValueError:
+                    raise CommandError(f"line {line}: invalid json")
+
+    def validate(self, user, seq, line, row, context):
+        serializer = ImportTransactionSerializer(data=row, context=context)
+        if not serializer.is_valid():
+            raise CommandError(f"line {line}: {dict(serializer.errors)}")
+        return Transaction(user=user, seq=seq, **serializer.validated_data)
+
+    def copy(self, transactions):
+        # PostgreSQL COPY: one round trip per batch and no per-row INSERT parsing
+        columns = ["user_id", "amount", "type", "category_id", "seq", "date"]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for transact in transactions:
+            writer.writerow([getattr(transact, column) for column in columns[:5]] + [transact.date.isoformat()])
+        buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                "COPY {} ({}) FROM STDIN WITH (FORMAT csv)".format(
+                    connection.ops.quote_name(Transaction._meta.db_table),
+                    ", ".join(connection.ops.quote_name(column) for column in columns)),
+                buffer)
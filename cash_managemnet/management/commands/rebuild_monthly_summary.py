@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.authtoken.admin import User
+
+from cash_managemnet.models import MonthlySummary
+
+
+class Command(BaseCommand):
+    """
+    info : rebuilds the MonthlySummary table (used by /report and /balance-as-of) from the transactions
+    usage :
+        python manage.py rebuild_monthly_summary                       # all users
+        python manage.py rebuild_monthly_summary --user keyvan --user another_user
+    """
+    help = "Rebuild the monthly summaries (used by /report) from the transactions"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", action="append", dest="usernames", metavar="USERNAME",
+                            help="rebuild the summaries of this user only (can be repeated)")
+
+    def handle(self, *args, usernames=None, **options):
+        user_ids = None
+        if usernames:
+            user_ids = list(User.objects.filter(username__in=usernames).values_list("id", flat=True))
+            if len(user_ids) != len(set(usernames)):
+                raise CommandError("Some of the users do not exist")
+        count = MonthlySummary.rebuild(user_ids)
+        self.stdout.write(self.style.SUCCESS(f"{count} monthly summaries rebuilt"))
@@ -0,0 +1,67 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from rest_framework.authtoken.admin import User
+
+from cash_managemnet.models import Balance
+
+
+class Command(BaseCommand):
+    """
+    info : compares the balances of all the users with the sums of their transactions (e.g. a nightly integrity
+        check). The users are split in shards of consecutive ids, each shard is one grouped aggregate
+        (see Balance.reconcile) and the shards run in a pool of threads, each with its own database connection.
+    usage :
+        python manage.py reconcile_balances                                # report the drifted balances
+        python manage.py reconcile_balances --fix                          # and repair them
+        python manage.py reconcile_balances --workers 8 --shard-size 5000
+    """
+    help = "Compare the balances of all users with their transactions and optionally repair them"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fix", action="store_true", help="repair the drifted balances")
+        parser.add_argument("--workers", type=int, default=min(8, os.cpu_count() or 1),
+                            help="number of shards checked concurrently (default: min(8, cpu count))")
+        parser.add_argument("--shard-size", type=int, default=1000, help="users per shard (default: 1000)")
+
+    def handle(self, *args, fix=False, workers=1, shard_size=1000, **options):
+        if workers < 1 or shard_size < 1:
+            raise CommandError("--workers and --shard-size should be positive")
+        start = time.perf_counter()
+        shards = self.get_shards(shard_size)
+        if workers == 1:
+            results = [Balance.reconcile(*shard, fix=fix) for shard in shards]
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(lambda shard: self.reconcile_shard(shard, fix), shards))
+
+        drifts = sorted(drift for result in results for drift in result)
+        for user_id, stored, expected in drifts:
+            self.stdout.write(f"user {user_id}: stored={stored} expected={expected}")
+        summary = (f"{len(drifts)} drifted balances in {len(shards)} shards "
+                   f"({time.perf_counter() - start:.1f}s)")
+        if fix:
+            self.stdout.write(self.style.SUCCESS(f"{summary}, repaired"))
+        elif drifts:
+            # non-zero exit status for the scheduler of the check
+            raise CommandError(summary)
+        else:
+            self.stdout.write(self.style.SUCCESS(summary))
+
+    @staticmethod
+    def get_shards(shard_size):
+        # (first_user_id, last_user_id) of every shard_size users
+        user_ids = list(User.objects.order_by("id").values_list("id", flat=True))
+        return [(user_ids[index], user_ids[min(index + shard_size, len(user_ids)) - 1])
+                for index in range(0, len(user_ids), shard_size)]
+
+    @staticmethod
+    def reconcile_shard(shard, fix):
+        # runs in a thread of the pool, the connections of the thread are closed after the shard
+        try:
+            return Balance.reconcile(*shard, fix=fix)
+        finally:
+            connections.close_all()
@@ -0,0 +1,182 @@
+import csv
+import datetime
+import math
+import random
+import time
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.authtoken.admin import User
+from rest_framework.authtoken.models import Token
+
+from cash_managemnet.models import Transaction, Category, Balance, MonthlySummary, TransactionDelta, month_start, \
+    next_month
+
+EXPENSE_CATEGORIES = ["Groceries", "Rent", "Utilities", "Transport", "Restaurants", "Shopping", "Health",
+                      "Entertainment", "Travel", "Education", "Insurance"]
+INCOME_CATEGORY = "Salary"
+MAX_AMOUNT = 2147483647  # Transaction.amount is a PositiveIntegerField
+SEQ = 1  # data version of the new users and change sequence of their transactions
+
+
+class LedgerGenerator:
+    """
+    info :
+        Generates realistic transactions for load tests:
+        -each user has an income share drawn from Beta(2, 6) (mostly expenses, ~25% incomes on average)
+        -incomes are mostly a salary around a per-user base, expenses are log-normal (heavy-tailed) amounts
+        -expense categories follow a per-user Zipf-like preference
+        -dates are spread over `months` months with a seasonal weight (December peak, spring low)
+        -the same seed generates the same transactions
+    usage :
+        generator = LedgerGenerator(expense_categories, income_category, months=24, seed=1)
+        for month, transact in generator.transactions(user_id, count): ...
+    """
+
+    def __init__(self, expense_categories, income_category, months, seed=None, now=None):
+        self.random = random.Random(seed)
+        self.expense_categories = expense_categories
+        self.income_category = income_category
+        now = now or timezone.now()
+        first_month = month_start(now)
+        for _ in range(months - 1):
+            first_month = month_start(first_month - datetime.timedelta(days=1))
+        # (month start, seconds in the month up to now)
+        self.months, weights, month = [], [], first_month
+        while month <= now:
+            end = min(next_month(month), now)
+            self.months.append((month, (end - month).total_seconds()))
+            weights.append(1 + 0.25 * math.cos(2 * math.pi * (month.month - 12) / 12))
+            month = next_month(month)
+        self.cum_weights = list(self.cumulate(weights))
+
+    @staticmethod
+    def cumulate(values):
+        total = 0
+        for value in values:
+            total += value
+            yield total
+
+    def date(self):
+        # (month start, date in the month)
+        month, seconds = self.random.choices(self.months, cum_weights=self.cum_weights)[0]
+        return month, month + datetime.timedelta(seconds=self.random.uniform(0, seconds))
+
+    def transactions(self, user_id, count):
+        rnd = self.random
+        income_share = rnd.betavariate(2, 6)
+        salary = rnd.lognormvariate(math.log(2000), 0.5)
+        categories = rnd.sample(self.expense_categories, len(self.expense_categories))
+        category_weights = list(self.cumulate(1 / (rank + 1) for rank in range(len(categories))))
+        for _ in range(count):
+            if rnd.random() < income_share:
+                if rnd.random() < 0.8:
+                    amount, category = salary * rnd.uniform(0.9, 1.1), self.income_category
+                else:  # refunds, side incomes
+                    amount, category = rnd.lognormvariate(math.log(50), 1), None
+                type = Transaction.TypeChoices.INCOME
+            else:
+                amount = rnd.lognormvariate(math.log(25), 1.1)
+                category = rnd.choices(categories, cum_weights=category_weights)[0]
+                type = Transaction.TypeChoices.EXPENSE
+            amount = min(max(int(amount), 1), MAX_AMOUNT)
+            month, date = self.date()
+            yield month, Transaction(user_id=user_id, amount=amount, type=type, category=category, date=date)
+
+
+class Command(BaseCommand):
+    """
+    info : generates users with synthetic transactions for load tests (see LedgerGenerator)
+        -users are created as <prefix><number>, with the password given by --password (unusable by default)
+        -transactions are written with chunked bulk_create, Transaction.save() is not called
+        -the balances and monthly summaries are computed in memory while generating and saved once at the end
+        -the balances are created with version 1, the change sequence (Transaction.seq) of all the transactions
+        -everything is saved in one database transaction
+    usage :
+        python manage.py seed_ledger --users 100 --transactions-per-user 10000
+        python manage.py seed_ledger --users 10 --transactions-per-user 1000 --password 123456 --tokens tokens.csv
+    """
+    help = "Generate users with realistic synthetic transactions for load tests"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, required=True, help="number of users to create")
+        parser.add_argument("--transactions-per-user", type=int, required=True)
+        parser.add_argument("--months", type=int, default=24, help="the transactions are in the last MONTHS months")
+        parser.add_argument("--prefix", default="seed-user-", help="prefix of the usernames")
+        parser.add_argument("--password", help="password of the users (default: unusable password)")
+        parser.add_argument("--tokens", metavar="FILE", help="create auth tokens and write username,token to FILE")
+        parser.add_argument("--seed", type=int, help="random seed, the same seed generates the same data")
+        parser.add_argument("--batch-size", type=int, default=10000, help="rows inserted per query")
+
+    def handle(self, *args, **options):
+        if options["users"] < 1 or options["transactions_per_user"] < 0 or options["months"] < 1:
+            raise CommandError("--users and --months should be positive, --transactions-per-user not negative")
+        usernames = [f"{options['prefix']}{index}" for index in range(options["users"])]
+        if User.objects.filter(username__in=usernames).exists():
+            raise CommandError(f"Some users {options['prefix']}* already exist, use another --prefix")
+
+        start = time.perf_counter()
+        with transaction.atomic():
+            categories = self.get_categories()
+            generator = LedgerGenerator([categories[name] for name in EXPENSE_CATEGORIES], categories[INCOME_CATEGORY],
+                                        options["months"], options["seed"])
+            # one hash for all the users, hashing is the slowest part of creating a user
+            password = make_password(options["password"])
+            users = User.objects.bulk_create([User(username=username, password=password) for username in usernames],
+                                             batch_size=options["batch_size"])
+            if users[0].pk is None:  # backends not returning the ids of bulk_create
+                users = list(User.objects.filter(username__in=usernames).order_by("id"))
+
+            delta = TransactionDelta()
+            rows = self.generate(generator, users, options["transactions_per_user"], delta)
+            count = 0
+            while batch := list(islice(rows, options["batch_size"])):
+                Transaction.objects.bulk_create(batch)
+                count += len(batch)
+                if options["verbosity"] > 1:
+                    self.stdout.write(f"{count} transactions")
+
+            # the users are new, so their balances and summaries are the accumulated deltas
+            Balance.objects.bulk_create([Balance(user_id=user.id, amnt=delta.balances[user.id], version=SEQ)
+                                         for user in users], batch_size=options["batch_size"])
+            MonthlySummary.objects.bulk_create(
+                MonthlySummary.with_opening_balances(
+                    MonthlySummary(user_id=user_id, month=month, income_total=values[0], expense_total=values[1],
+                                   income_count=values[2], expense_count=values[3])
+                    for (user_id, month), values in sorted(delta.summaries.items())),
+                batch_size=options["batch_size"])
+
+            if options["tokens"]:
+                tokens = Token.objects.bulk_create([Token(user=user, key=Token.generate_key()) for user in users])
+                with open(options["tokens"], "w", newline="") as file:
+                    writer = csv.writer(file)
+                    writer.writerow(["username", "token"])
+                    writer.writerows([token.user.username, token.key] for token in tokens)
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(users)} users and {count} transactions created in {elapsed:.1f}s "
+            f"({count / max(elapsed, 1e-9):.0f} transactions/s)"))
+
+    @staticmethod
+    def get_categories():
+        # categories by name, the missing ones are created
+        names = EXPENSE_CATEGORIES + [INCOME_CATEGORY]
+        categories = {}
+        for category in Category.objects.filter(name__in=names).order_by("id"):
+            categories.setdefault(category.name, category)
+        missing = [Category(name=name) for name in names if name not in categories]
+        for category in Category.objects.bulk_create(missing):
+            categories[category.name] = category
+        return categories
+
+    @staticmethod
+    def generate(generator, users, count, delta):
+        for user in users:
+            for month, transact in generator.transactions(user.id, count):
+                delta.add(transact.user_id, transact.amount, transact.type, transact.date, month=month)
+                transact.seq = SEQ
+                yield transact
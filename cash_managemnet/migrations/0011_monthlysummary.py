@@ -0,0 +1,48 @@
+# Generated by Django 4.2.4 on 2026-10-18 19:07
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum, Q, Count
+from django.db.models.functions import TruncMonth
+import django.db.models.deletion
+
+
+def populate_monthly_summary(apps, schema_editor):
+    # same aggregate as MonthlySummary.rebuild(), on the historical models
+    Transaction = apps.get_model("cash_managemnet", "Transaction")
+    MonthlySummary = apps.get_model("cash_managemnet", "MonthlySummary")
+    rows = Transaction.objects.annotate(month=TruncMonth("date")).values("user_id", "month").annotate(
+        income_total=Sum("amount", filter=Q(type="I"), default=0),
+        expense_total=Sum("amount", filter=Q(type="E"), default=0),
+        income_count=Count("id", filter=Q(type="I")),
+        expense_count=Count("id", filter=Q(type="E")),
+    ).order_by()
+    MonthlySummary.objects.bulk_create((MonthlySummary(**row) for row in rows), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('cash_managemnet', '0010_transaction_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateTimeField()),
+                ('income_total', models.BigIntegerField(default=0)),
+                ('expense_total', models.BigIntegerField(default=0)),
+                ('income_count', models.PositiveIntegerField(default=0)),
+                ('expense_count', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='monthlysummary',
+            constraint=models.UniqueConstraint(fields=('user', 'month'), name='cm_monthly_summary_user_month_uniq'),
+        ),
+        migrations.RunPython(populate_monthly_summary, migrations.RunPython.noop),
+    ]
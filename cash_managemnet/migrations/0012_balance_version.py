@@ -0,0 +1,18 @@
+# Generated by Django 4.2.4 on 2026-10-18 19:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cash_managemnet', '0011_monthlysummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='balance',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.4 on 2026-10-18 19:44
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('cash_managemnet', '0012_balance_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletedTransaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('transaction_id', models.BigIntegerField()),
+                ('seq', models.PositiveBigIntegerField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='seq',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'seq', 'id'], name='cm_tx_user_seq_idx'),
+        ),
+        migrations.AddField(
+            model_name='deletedtransaction',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='deletedtransaction',
+            index=models.Index(fields=['user', 'seq', 'transaction_id'], name='cm_deleted_tx_user_seq_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.4 on 2026-10-18 19:51
+
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Sum, Q, Count, Max
+
+
+def deduplicate_balances(apps, schema_editor):
+    # one balance per user before the unique constraint: the first row is kept with the recomputed amount,
+    # its version is increased past all the duplicates so the cached data of the user is invalidated
+    Balance = apps.get_model("cash_managemnet", "Balance")
+    Transaction = apps.get_model("cash_managemnet", "Transaction")
+    duplicated = Balance.objects.values("user_id").annotate(count=Count("id"), version=Max("version")).filter(
+        count__gt=1)
+    for row in duplicated:
+        balances = Balance.objects.filter(user_id=row["user_id"]).order_by("id")
+        kept = balances.first()
+        balances.exclude(id=kept.id).delete()
+        totals = Transaction.objects.filter(user_id=row["user_id"]).aggregate(
+            incomes=Sum("amount", filter=Q(type="I"), default=0),
+            expenses=Sum("amount", filter=Q(type="E"), default=0),
+        )
+        kept.amnt = totals["incomes"] - totals["expenses"]
+        kept.version = row["version"] + 1
+        kept.save(update_fields=["amnt", "version"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('cash_managemnet', '0013_transaction_seq'),
+    ]
+
+    operations = [
+        migrations.RunPython(deduplicate_balances, migrations.RunPython.noop),
+    ]
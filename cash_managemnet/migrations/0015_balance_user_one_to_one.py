@@ -0,0 +1,22 @@
+# Generated by Django 4.2.4 on 2026-10-18 19:51
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    # separate from the data migration: PostgreSQL can not alter a table with pending deferred constraint checks
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('cash_managemnet', '0014_deduplicate_balances'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='balance',
+            name='user',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.4 on 2026-10-18 19:59
+
+from django.db import migrations, models
+
+
+def set_opening_balances(apps, schema_editor):
+    # running balance of every user at the start of each month with transactions
+    MonthlySummary = apps.get_model("cash_managemnet", "MonthlySummary")
+    user_id, balance, summaries = None, 0, []
+    for summary in MonthlySummary.objects.order_by("user_id", "month").iterator(chunk_size=1000):
+        if summary.user_id != user_id:
+            user_id, balance = summary.user_id, 0
+        summary.opening_balance = balance
+        balance += summary.income_total - summary.expense_total
+        summaries.append(summary)
+        if len(summaries) == 1000:
+            MonthlySummary.objects.bulk_update(summaries, ["opening_balance"])
+            summaries = []
+    MonthlySummary.objects.bulk_update(summaries, ["opening_balance"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cash_managemnet', '0015_balance_user_one_to_one'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='monthlysummary',
+            name='opening_balance',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(set_opening_balances, migrations.RunPython.noop),
+    ]
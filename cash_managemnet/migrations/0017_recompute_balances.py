@@ -0,0 +1,42 @@
+# Generated by Django 4.2.4 on 2026-10-18 21:10
+
+from django.db import migrations
+from django.db.models import Sum, Q
+
+
+def recompute_balances(apps, schema_editor):
+    # the balances stored before the incremental updates were computed with
+    #   incomes if incomes else 0 - expenses if expenses else 0
+    # (the incomes only for the users with incomes), the deltas of the later writes were added to them.
+    # every balance is recomputed with one grouped aggregate, the changed ones get a new data version
+    Balance = apps.get_model("cash_managemnet", "Balance")
+    Transaction = apps.get_model("cash_managemnet", "Transaction")
+    expected = {
+        row["user_id"]: row["incomes"] - row["expenses"]
+        for row in Transaction.objects.values("user_id").annotate(
+            incomes=Sum("amount", filter=Q(type="I"), default=0),
+            expenses=Sum("amount", filter=Q(type="E"), default=0),
+        ).order_by()
+    }
+    changed = []
+    for balance in Balance.objects.all().iterator(chunk_size=1000):
+        amnt = expected.pop(balance.user_id, 0)
+        if balance.amnt != amnt:
+            balance.amnt = amnt
+            balance.version += 1
+            changed.append(balance)
+    Balance.objects.bulk_update(changed, ["amnt", "version"], batch_size=1000)
+    # users with transactions but without balance row
+    Balance.objects.bulk_create([Balance(user_id=user_id, amnt=amnt, version=1) for user_id, amnt in expected.items()],
+                                batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cash_managemnet', '0016_monthlysummary_opening_balance'),
+    ]
+
+    operations = [
+        migrations.RunPython(recompute_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,195 @@
+import csv
+import hashlib
+
+from django.http import StreamingHttpResponse
+from django.utils.http import parse_etags
+from rest_framework import serializers
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+
+from cash_managemnet.models import Balance, Transaction
+from cash_managemnet.serializers import TransactionSerializer, datetime_representation
+from config.fast_json import FastJSONRenderer
+
+
+def make_etag(user_id, version, full_path, media_type):
+    # strong ETag of a representation of the user data at the given data version
+    raw = "{}:{}:{}:{}".format(user_id, version, full_path, media_type)
+    return '"{}"'.format(hashlib.sha1(raw.encode()).hexdigest())
+
+
+def etag_matches(request, etag):
+    # True if the client already has the representation (If-None-Match header)
+    if_none_match = parse_etags(request.headers.get("If-None-Match", ""))
+    return etag in if_none_match or "*" in if_none_match
+
+
+class NotModified(APIException):
+    """
+    raised by ConditionalGetMixin when the client already has the current representation
+    """
+    status_code = 304
+    default_detail = "Not modified."
+    default_code = "not_modified"
+
+
+class ConditionalGetMixin:
+    """
+    info :
+        Conditional GET for views returning data of the authenticated user.
+        The ETag is derived from the data version of the user (models.Balance.version), the url and the
+        response format, so it is computed without touching the Transaction table.
+        A request with the current ETag in If-None-Match gets 304 (Not Modified) with an empty body.
+    usage :
+        class GetTransactionView(ConditionalGetMixin, RetrieveAPIView): ...
+    headers =
+        If-None-Match : "<etag>"
+    """
+
+    def get_data_version(self):
+        # data version of the user, read once per request
+        if not hasattr(self, "_data_version"):
+            self._data_version = Balance.get_version(self.request.user.id)
+        return self._data_version
+
+    def get_etag(self, request):
+        return make_etag(request.user.id, self.get_data_version(), request.get_full_path(),
+                         request.accepted_media_type)
+
+    def initial(self, request, *args, **kwargs):
+        # runs after authentication and permission checks, before the handler (get)
+        super().initial(request, *args, **kwargs)
+        if request.method == "GET":
+            self.etag = self.get_etag(request)
+            if self.etag is not None and etag_matches(request, self.etag):
+                raise NotModified()
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return Response(status=304)
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if getattr(self, "etag", None) and response.status_code in (200, 304):
+            response["ETag"] = self.etag
+        return response
+
+
+class TransactionFilterMixin:
+    """
+    info :
+        Applies the query params of Transaction.filtering_lookups and order_by to the queryset of the view
+            ?type=I&date__lt=2022-12-12T15:15:15&order_by=date
+                =>  queryset.filter(type__exact="I", date__lt="2022-12-12T15:15:15").order_by("date")
+    usage :
+        class GetAllTransactionView(TransactionFilterMixin, ListAPIView): ...
+    """
+
+    def filter_queryset(self, queryset):
+        # the function to apply query params in the result
+
+        filter_lookups = {}
+        # extract params from the url
+        for name, value in Transaction.filtering_lookups:  # filtering_lookup in .models/Transaction model
+            param = self.request.GET.get(value)
+            if param:
+                filter_lookups[name] = param
+
+        order_by = self.request.GET.get("order_by")
+        # check if order_by value is a valid field name (default = id)
+        if order_by is None or order_by not in [f.name for f in Transaction._meta.get_fields()]:
+            order_by = "id"
+        # apply all lookups found in url
+        return queryset.filter(**filter_lookups).order_by(order_by)
+
+
+class TransactionExportMixin(TransactionFilterMixin):
+    """
+    info :
+        The export file of the transactions of the user (csv or ndjson), shared by the sync and async export views.
+        The view reads get_rows() in chunks and streams the lines of get_line_format() with streaming_response().
+    usage :
+        class ExportTransactionView(TransactionExportMixin, APIView): ...
+    """
+    fields = ["id", "amount", "type", "category", "date"]  # same as TransactionSerializer
+    chunk_size = 2000  # number of rows fetched from the database at once
+    content_types = {
+        "csv": "text/csv",
+        "ndjson": "application/x-ndjson",
+    }
+
+    def get_export_format(self):
+        export_format = self.request.GET.get("export_format", "csv")
+        if export_format not in self.content_types:
+            raise serializers.ValidationError({"export_format": f"Should be one of {list(self.content_types)}"})
+        return export_format
+
+    def get_rows(self):
+        queryset = self.filter_queryset(Transaction.objects.filter(user=self.request.user))
+        # named rows: with django 4.2 the plain values_list iterable runs its query when it is created,
+        # so aiterator() would run it on the event loop
+        return queryset.values_list("id", "amount", "type", "category_id", "date", named=True)
+
+    def get_line_format(self, export_format):
+        # (first line or None, function formatting a row as a line), the lines are bytes
+        # dates formatted the same as TransactionSerializer
+        date = datetime_representation(TransactionSerializer().fields["date"])
+        if export_format == "csv":
+            writer = csv.writer(_LineBuffer())
+
+            def format_row(row):
+                return writer.writerow(row[:4] + (date(row[4]),)).encode()
+            return writer.writerow(self.fields).encode(), format_row
+
+        renderer = FastJSONRenderer()
+
+        def format_row(row):
+            return renderer.render(dict(zip(self.fields, row[:4] + (date(row[4]),)))) + b"\n"
+        return None, format_row
+
+    def streaming_response(self, lines, export_format):
+        response = StreamingHttpResponse(lines, content_type=self.content_types[export_format])
+        response["Content-Disposition"] = f'attachment; filename="transactions.{export_format}"'
+        return response
+
+
+class _LineBuffer:
+    # file-like object for csv.writer, writerow() returns the written line instead of storing it
+    def write(self, value):
+        return value
+
+
+class SparseFieldsMixin:
+    """
+    info :
+        ?fields=id,amount restricts the fields of the response to the given fields of TransactionSerializer,
+        and the columns read from the database to their columns (400 for unknown fields)
+            ?fields=id,amount  =>  queryset.only("id", "amount"), TransactionSerializer(..., fields=["id", "amount"])
+        the fields are returned in the order of TransactionSerializer.Meta.fields
+    usage :
+        class GetTransactionView(SparseFieldsMixin, RetrieveAPIView): ...
+    """
+    sparse_fields = TransactionSerializer.Meta.fields
+
+    def get_sparse_fields(self):
+        # requested fields, None for all the fields
+        param = self.request.GET.get("fields")
+        requested = {name.strip() for name in param.split(",")} - {""} if param else None
+        if not requested:
+            return None
+        if unknown := requested.difference(self.sparse_fields):
+            raise serializers.ValidationError(
+                {"fields": f"Unknown fields {sorted(unknown)}, should be some of {self.sparse_fields}"})
+        return [name for name in self.sparse_fields if name in requested]
+
+    def sparse_queryset(self, queryset):
+        # only the columns of the requested fields and of the ordering (read by the pagination)
+        fields = self.get_sparse_fields()
+        if fields is None:
+            return queryset
+        return queryset.only(*fields, *(name.lstrip("-") for name in queryset.query.order_by))
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault("fields", self.get_sparse_fields())
+        return super().get_serializer(*args, **kwargs)
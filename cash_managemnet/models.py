@@ -1,8 +1,22 @@
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
 from django.db import models, transaction
-from django.db.models import Sum
+from django.db.models import Sum, Q, Count, F
+from django.db.models.functions import TruncMonth
+from django.dispatch import Signal
 from django.utils import timezone
 from rest_framework.authtoken.admin import User
 
+logger = logging.getLogger(__name__)
+
+# sent by the transaction writes (see TransactionDelta.notify) with
+#   balances: {user_id: Balance} the balances of the users after the write
+#   created, updated: the written transactions, deleted: [(user_id, transaction_id)]
+transactions_changed = Signal()
+
 
 class Category(models.Model):
     """
@@ -20,25 +34,131 @@ class Balance(models.Model):
         Balance model to store balance of a user
     fields :
         user:
-            An authenticated User
+            An authenticated User, one balance per user (read with a single unique index lookup)
         amnt:
             The value of balance . It should get negative !
+        version:
+            Increased on every transaction write of the user. cached data of the user
+            (e.g. /report) is keyed by it, so it is never served stale.
+            It is also the change sequence of the written transactions (Transaction.seq).
     """
 
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    user = models.OneToOneField(User, on_delete=models.CASCADE)
     amnt = models.IntegerField(default=0)
+    version = models.PositiveBigIntegerField(default=0)
+
+    @classmethod
+    def apply_delta(cls, user_id, delta):
+        """
+        -Adds the signed delta of a write (insert/update/delete) to the user balance, so writes
+            cost O(1) instead of re-aggregating the whole history.
+        -The balance row is locked (select_for_update) so concurrent writes of one user are serialized.
+        -The data version of the user is increased.
+        -Should be called inside transaction.atomic()
+        -The result is compared against the full recompute (settings.BALANCE_VERIFY) by TransactionDelta.verify(),
+            once the transactions are written.
+        """
+        balance, _ = cls.objects.select_for_update().get_or_create(user_id=user_id)
+        balance.amnt += delta
+        balance.version += 1
+        balance.save(update_fields=["amnt", "version"])
+        return balance
+
+    @classmethod
+    def next_version(cls, user_id):
+        """
+        -Increases the data version of the user and returns it, the balance row is locked.
+        -Used as change sequence of transactions written without Transaction.save()/bulk_insert() (e.g. imports).
+        -Should be called inside transaction.atomic()
+        """
+        balance, _ = cls.objects.select_for_update().get_or_create(user_id=user_id)
+        balance.version += 1
+        balance.save(update_fields=["version"])
+        return balance.version
+
+    @classmethod
+    def get_version(cls, user_id):
+        # data version of the user (0 before the first write)
+        return cls.objects.filter(user_id=user_id).values_list("version", flat=True).first() or 0
+
+    @classmethod
+    async def aget_version(cls, user_id):
+        # async version of get_version()
+        return await cls.objects.filter(user_id=user_id).values_list("version", flat=True).afirst() or 0
+
+    def compute_balance_amount(self):
+        # full recompute: sum of incomes - sum of expenses of the user (null->0)
+        return self.compute_balance_amounts(Transaction.objects.filter(user_id=self.user_id)).get(self.user_id, 0)
+
+    @staticmethod
+    def compute_balance_amounts(transactions):
+        # full recompute of the balances of the users of the transactions queryset with one grouped aggregate:
+        # {user_id: sum of incomes - sum of expenses}, users without transactions are missing
+        rows = transactions.values("user_id").annotate(
+            incomes=Sum("amount", filter=Q(type=Transaction.TypeChoices.INCOME), default=0),
+            expenses=Sum("amount", filter=Q(type=Transaction.TypeChoices.EXPENSE), default=0),
+        ).order_by()
+        return {row["user_id"]: row["incomes"] - row["expenses"] for row in rows}
+
+    @classmethod
+    def reconcile(cls, first_user_id, last_user_id, fix=False):
+        """
+        -Compares the balances of the users first_user_id <= id <= last_user_id with the full recompute,
+            with one grouped aggregate over their transactions (instead of one aggregate per user).
+        -The drifted balances are locked and recomputed again, so the writes committed meanwhile are not
+            reported as drift. fix: they are repaired with one bulk update and their data version is increased.
+        -returns the drifts [(user_id, stored amount (None without balance row), expected amount)]
+        """
+        user_range = Q(user_id__gte=first_user_id, user_id__lte=last_user_id)
+        expected = cls.compute_balance_amounts(Transaction.objects.filter(user_range))
+        stored = dict(cls.objects.filter(user_range).values_list("user_id", "amnt"))
+        drifted = sorted(user_id for user_id in stored.keys() | expected.keys()
+                         if stored.get(user_id, 0) != expected.get(user_id, 0))
+        if not drifted:
+            return []
+
+        with transaction.atomic():
+            if fix:
+                # a missing balance row is created, the writes of the user are serialized by it
+                cls.objects.bulk_create([cls(user_id=user_id) for user_id in drifted if user_id not in stored],
+                                        ignore_conflicts=True)
+            balances = {balance.user_id: balance for balance in
+                        cls.objects.select_for_update().filter(user_id__in=drifted).order_by("user_id")}
+            expected = cls.compute_balance_amounts(Transaction.objects.filter(user_id__in=drifted))
+            drifts, fixed = [], []
+            for user_id in drifted:
+                balance = balances.get(user_id)
+                amnt = expected.get(user_id, 0)
+                if balance is None:
+                    drifts.append((user_id, None, amnt))
+                elif balance.amnt != amnt:
+                    drifts.append((user_id, balance.amnt if user_id in stored else None, amnt))
+                    balance.amnt = amnt
+                    balance.version += 1
+                    fixed.append(balance)
+            if fix:
+                cls.objects.bulk_update(fixed, ["amnt", "version"], batch_size=1000)
+        return drifts
 
     def update_balance_amount(self):
         # Iterate into Transactions, calculate expenses and incomes, then subtract them
-
-        # get incomes of user
-        incomes = Transaction.incomes.filter(user=self.user).aggregate(val=Sum("amount"))["val"]
-        # get expenses of user
-        expenses = Transaction.expenses.filter(user=self.user).aggregate(val=Sum("amount"))["val"]
-        # income or expenses should not be null . null->0
-        self.amnt = incomes if incomes else 0 - expenses if expenses else 0
+        self.amnt = self.compute_balance_amount()
         self.save()
 
+    def verify_balance_amount(self):
+        """
+        compares the stored amount with the full recompute.
+        on drift, logs an error and repairs the stored amount.
+        returns True if the stored amount was correct.
+        """
+        expected = self.compute_balance_amount()
+        if self.amnt == expected:
+            return True
+        logger.error("Balance drift for user %s: stored=%s expected=%s", self.user_id, self.amnt, expected)
+        self.amnt = expected
+        self.save(update_fields=["amnt"])
+        return False
+
 
 class TransactionIncomeManager(models.Manager):
     """
@@ -75,6 +195,9 @@ class Transaction(models.Model):
         category : foreign key to Category model
         date : The date of transaction. it is created automatically while transaction is being saved.
             it can be modified by the serializer.
+        seq : change sequence, the data version of the user (Balance.version) set by the last write of the
+            transaction. The writes of a user lock the balance row of the user, so seq increases in commit order
+            and the changes after a seq are never committed later (read by /sync-transaction).
     """
 
     class TypeChoices(models.TextChoices):
@@ -89,11 +212,22 @@ class Transaction(models.Model):
     type = models.CharField(max_length=1, choices=TypeChoices.choices)
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True)
     date = models.DateTimeField(default=timezone.now)  # 2020-01-01T12:12:12
+    seq = models.PositiveBigIntegerField(default=0)
 
     objects = models.Manager()  # first and default manager
     incomes = TransactionIncomeManager()  # Transaction.incomes.all()
     expenses = TransactionExpenseManager()  # Transaction.expenses.all()
 
+    class Meta:
+        # every query is filtered by user, these indexes match the filtering_lookups, order_by and /report access paths
+        indexes = [
+            models.Index(fields=["user", "date"], name="cm_tx_user_date_idx"),  # date filters, order_by=date, report
+            models.Index(fields=["user", "type", "date"], name="cm_tx_user_type_date_idx"),  # type filter, incomes/expenses
+            models.Index(fields=["user", "category", "date"], name="cm_tx_user_category_date_idx"),  # category filter
+            models.Index(fields=["user", "amount"], name="cm_tx_user_amount_idx"),  # amount filters, order_by=amount
+            models.Index(fields=["user", "seq", "id"], name="cm_tx_user_seq_idx"),  # change feed
+        ]
+
     # query params to filter database
     #  /transaction?type=I&date__lt=2022-12-12T15:15:15
     #        =>  Transaction.objects.filter(type__exact="I", date__lt="2022-12-12T15:15:15")
@@ -103,34 +237,365 @@ class Transaction(models.Model):
         ('amount__lt', 'amount__lt'),
         ('amount__gt', 'amount__gt'),
         ('date__lt', 'date__lt'),
-        ('date_gt', 'date__gt')
+        ('date__gt', 'date__gt')
     ]
 
+    @classmethod
+    def signed_amount(cls, amount, type):
+        # effect of a transaction on the balance: incomes are added, expenses are subtracted
+        if type == cls.TypeChoices.INCOME:
+            return amount
+        if type == cls.TypeChoices.EXPENSE:
+            return -amount
+        return 0
+
+    def _locked_previous(self):
+        # stored (user, amount, type, date) of this transaction, the row is locked until the end of the atomic block
+        if self.pk is None:
+            return None
+        return Transaction.objects.select_for_update().filter(pk=self.pk).values(
+            "user_id", "amount", "type", "date").first()
+
     def save(self, *args, **kwargs):
         """
-        -Overriding save function to update balance of the user.
+        -Overriding save function to update balance and monthly summary of the user.
         -is called by:
             serializer.update(),
             serializer.partial_update(),
             serializers.save()
         -The transaction is atomic so that creating transaction and updating balance should
             happens just together
+        -The balance is adjusted by the difference between the stored and the new values
+            (amount changes and type flips), not recomputed.
+        -seq is set to the new data version of the user, a transaction moved to another user
+            is recorded as deleted for the previous one (DeletedTransaction).
+        -transactions_changed is sent (created or updated).
         """
         with transaction.atomic():
+            previous = self._locked_previous()
+            delta = TransactionDelta()
+            if previous is not None:
+                delta.add(sign=-1, **previous)
+            delta.add(self.user_id, self.amount, self.type, self.date)
+            versions = delta.apply()
+            self.seq = versions[self.user_id]
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {*kwargs["update_fields"], "seq"}
+            moved = previous is not None and previous["user_id"] != self.user_id
+            if moved:
+                DeletedTransaction.objects.create(user_id=previous["user_id"], transaction_id=self.pk,
+                                                  seq=versions[previous["user_id"]])
             transact = super(Transaction, self).save(*args, **kwargs)
-            balance, _ = Balance.objects.get_or_create(user=self.user)  # create of get balance object
-            balance.update_balance_amount()
+            delta.verify()
+            if previous is None or moved:
+                delta.notify(created=[self], deleted=[(previous["user_id"], self.pk)] if moved else [])
+            else:
+                delta.notify(updated=[self])
             return transact
 
+    @classmethod
+    def bulk_insert(cls, transactions, batch_size=1000):
+        """
+        -Inserts many new transactions with bulk_create in chunks of batch_size.
+        -save() is not called per transaction, the balance and monthly summaries of every user in the batch
+            are adjusted once.
+        -The transaction is atomic so that the batch and the balances are saved together.
+        -The transactions of a user share one seq (the new data version of the user).
+        -transactions_changed is sent once for the batch.
+        -returns the created transactions (with their ids)
+        """
+        delta = TransactionDelta()
+        for transact in transactions:
+            delta.add(transact.user_id, transact.amount, transact.type, transact.date)
+        with transaction.atomic():
+            versions = delta.apply()
+            for transact in transactions:
+                transact.seq = versions[transact.user_id]
+            created = cls.objects.bulk_create(transactions, batch_size=batch_size)
+            delta.verify()
+            delta.notify(created=created)
+        return created
+
     def delete(self, *args):
         """
-        -Overriding delete function to recalculate the balance
+        -Overriding delete function to recalculate the balance and monthly summary
         -is called by:
             model.delete()
         -The transaction is atomic so that deleting transaction and updating balance should
             happens just together
-                """
+        -The balance is adjusted by the stored amount of the deleted transaction.
+        -The delete is recorded (DeletedTransaction) for the change feed and transactions_changed is sent.
+        """
         with transaction.atomic():
-            super(Transaction, self).delete(*args)
-            balance = Balance.objects.get(user=self.user)
+            previous, transaction_id = self._locked_previous(), self.pk
+            delta = TransactionDelta()
+            if previous is not None:
+                delta.add(sign=-1, **previous)
+                versions = delta.apply()
+                DeletedTransaction.objects.create(user_id=previous["user_id"], transaction_id=transaction_id,
+                                                  seq=versions[previous["user_id"]])
+            deleted = super(Transaction, self).delete(*args)
+            delta.verify()
+            if previous is not None:
+                delta.notify(deleted=[(previous["user_id"], transaction_id)])
+            return deleted
+
+
+class DeletedTransaction(models.Model):
+    """
+    info :
+        Tombstone of a deleted transaction, so the change feed (/sync-transaction) can tell
+        offline clients which transactions to remove.
+        It is written by Transaction.delete() (and by Transaction.save() when a transaction moves to another user).
+    fields :
+        user: owner of the deleted transaction
+        transaction_id: id of the deleted transaction
+        seq: change sequence of the delete (see Transaction.seq)
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    transaction_id = models.BigIntegerField()
+    seq = models.PositiveBigIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "seq", "transaction_id"], name="cm_deleted_tx_user_seq_idx"),
+        ]
+
+
+def month_start(date):
+    """
+    first moment of the month of the date in the current timezone (same as TruncMonth("date"))
+    """
+    date = models.DateTimeField().to_python(date)
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return timezone.localtime(date).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(month):
+    # first moment of the month after month (month should be a month_start)
+    return (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+class MonthlySummary(models.Model):
+    """
+    info :
+        Monthly rollup of the transactions of a user. it feeds /report so report latency depends on
+        the number of months, not the number of transactions.
+        The opening balances are snapshots of the balance at the month boundaries, they answer
+        the balance as of a date (see balance_as_of) with at most one month of transactions.
+        It is maintained by Transaction.save(), Transaction.delete() and Transaction.bulk_insert()
+        and can be rebuilt by `manage.py rebuild_monthly_summary`
+    fields :
+        user: owner of the transactions
+        month: first moment of the month (current timezone)
+        income_total, expense_total: sum of amounts of incomes and expenses in the month
+        income_count, expense_count: number of incomes and expenses in the month
+        opening_balance: balance of the user at the start of the month (sum of the transactions before it)
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    month = models.DateTimeField()
+    income_total = models.BigIntegerField(default=0)
+    expense_total = models.BigIntegerField(default=0)
+    income_count = models.PositiveIntegerField(default=0)
+    expense_count = models.PositiveIntegerField(default=0)
+    opening_balance = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "month"], name="cm_monthly_summary_user_month_uniq"),
+        ]
+
+    @classmethod
+    def apply_deltas(cls, deltas):
+        """
+        -deltas: {(user_id, month): [income_total, expense_total, income_count, expense_count]}
+        -adds the deltas to the summary rows (rows are locked), empty months are removed.
+        -the net of a month is added to the opening balances of the later months of the user
+            (e.g. a back-dated transaction), a new month opens with the closing balance of the previous one.
+        -Should be called inside transaction.atomic()
+        """
+        for (user_id, month), values in sorted(deltas.items()):
+            if not any(values):
+                continue
+            summary, created = cls.objects.select_for_update().get_or_create(user_id=user_id, month=month)
+            if created:
+                previous = cls.objects.filter(user_id=user_id, month__lt=month).order_by("-month").first()
+                if previous is not None:
+                    summary.opening_balance = previous.opening_balance + previous.income_total - previous.expense_total
+            if net := values[0] - values[1]:
+                cls.objects.filter(user_id=user_id, month__gt=month).update(opening_balance=F("opening_balance") + net)
+            summary.income_total += values[0]
+            summary.expense_total += values[1]
+            summary.income_count += values[2]
+            summary.expense_count += values[3]
+            if summary.income_count or summary.expense_count:
+                summary.save()
+            else:
+                summary.delete()
+
+    @classmethod
+    def rebuild(cls, user_ids=None):
+        """
+        recomputes the summaries of the users (all users if user_ids is None) from the transactions
+        """
+        with transaction.atomic():
+            balances = Balance.objects.all()
+            summaries = cls.objects.all()
+            transactions = Transaction.objects.all()
+            if user_ids is not None:
+                balances = balances.filter(user_id__in=user_ids)
+                summaries = summaries.filter(user_id__in=user_ids)
+                transactions = transactions.filter(user_id__in=user_ids)
+            # locks the balances (blocks the writes of the users meanwhile) and invalidates their cached reports
+            balances.update(version=F("version") + 1)
+            summaries.delete()
+            rows = transactions.annotate(month=TruncMonth("date")).values("user_id", "month").annotate(
+                income_total=Sum("amount", filter=Q(type=Transaction.TypeChoices.INCOME), default=0),
+                expense_total=Sum("amount", filter=Q(type=Transaction.TypeChoices.EXPENSE), default=0),
+                income_count=Count("id", filter=Q(type=Transaction.TypeChoices.INCOME)),
+                expense_count=Count("id", filter=Q(type=Transaction.TypeChoices.EXPENSE)),
+            ).order_by("user_id", "month")
+            return len(cls.objects.bulk_create(cls.with_opening_balances(cls(**row) for row in rows), batch_size=1000))
+
+    @staticmethod
+    def with_opening_balances(summaries):
+        # summaries ordered by user and month, yielded with their opening balances (running sum of the months)
+        user_id, balance = None, 0
+        for summary in summaries:
+            if summary.user_id != user_id:
+                user_id, balance = summary.user_id, 0
+            summary.opening_balance = balance
+            balance += summary.income_total - summary.expense_total
+            yield summary
+
+    @classmethod
+    def balance_as_of(cls, user_id, date):
+        """
+        -balance of the user with the transactions until date (included)
+        -read from the opening balance of the last month with transactions until date, plus the transactions
+            of the user since the start of that month: the cost is bounded by one month of transactions,
+            whatever the age of the account.
+        """
+        snapshot = cls.objects.filter(user_id=user_id, month__lte=date).order_by("-month").values(
+            "month", "opening_balance").first()
+        if snapshot is None:  # no transaction until date
+            return 0
+        transactions = Transaction.objects.filter(user_id=user_id, date__gte=snapshot["month"], date__lte=date)
+        return snapshot["opening_balance"] + Balance.compute_balance_amounts(transactions).get(user_id, 0)
+
+    @classmethod
+    def report(cls, user_id, date__gt=None, date__lt=None):
+        """
+        -monthly incomes and expenses of the user with date in (date__gt, date__lt), ordered by month
+        -months fully inside the range are read from the summary, only the (at most two) months containing
+            date__gt and date__lt are aggregated from the transactions.
+        -returns [{"month": <datetime>, "expenses": <int|None>, "incomes": <int|None>}, ...]
+        """
+        summaries, partial_months = cls.report_querysets(user_id, date__gt, date__lt)
+        return cls.merge_report(summaries, partial_months)
+
+    @classmethod
+    async def areport(cls, user_id, date__gt=None, date__lt=None):
+        # async version of report()
+        summaries, partial_months = cls.report_querysets(user_id, date__gt, date__lt)
+        return cls.merge_report([summary async for summary in summaries], [row async for row in partial_months])
+
+    @classmethod
+    def report_querysets(cls, user_id, date__gt=None, date__lt=None):
+        # (summaries of the months inside the range, group by of the transactions of the boundary months)
+        summaries = cls.objects.filter(user_id=user_id)
+        transactions = Transaction.objects.filter(user_id=user_id)
+        partial_months = Q(pk__in=[])
+        if date__gt is not None:
+            transactions = transactions.filter(date__gt=date__gt)
+            first_month = month_start(date__gt)
+            summaries = summaries.filter(month__gt=first_month)
+            partial_months |= Q(date__lt=next_month(first_month))
+        if date__lt is not None:
+            transactions = transactions.filter(date__lt=date__lt)
+            last_month = month_start(date__lt)
+            summaries = summaries.filter(month__lt=last_month)
+            partial_months |= Q(date__gte=last_month)
+        return summaries, transactions.filter(partial_months).annotate(month=TruncMonth("date")).values(
+            "month").annotate(
+            expenses=Sum("amount", filter=Q(type=Transaction.TypeChoices.EXPENSE)),
+            incomes=Sum("amount", filter=Q(type=Transaction.TypeChoices.INCOME)),
+        ).values("month", "expenses", "incomes").order_by()
+
+    @staticmethod
+    def merge_report(summaries, partial_months):
+        months = {}
+        for summary in summaries:
+            months[summary.month] = {
+                "month": timezone.localtime(summary.month),
+                "expenses": summary.expense_total if summary.expense_count else None,
+                "incomes": summary.income_total if summary.income_count else None,
+            }
+        for row in partial_months:
+            months[row["month"]] = row
+        return [months[month] for month in sorted(months)]
+
+
+class TransactionDelta:
+    """
+    info :
+        Accumulates the effect of transaction writes on Balance and MonthlySummary,
+        so they are applied once per write or per batch.
+    usage :
+        delta = TransactionDelta()
+        delta.add(user_id, amount, type, date)           # inserted transaction
+        delta.add(user_id, amount, type, date, sign=-1)  # deleted transaction (or old values of an update)
+        versions = delta.apply()                         # inside transaction.atomic(), before writing the transactions
+        ...                                              # write the transactions with seq=versions[user_id]
+        delta.verify()                                   # after writing them
+        delta.notify(created=[...])                      # sends transactions_changed
+    """
+
+    def __init__(self):
+        self.balances = defaultdict(int)
+        self.summaries = defaultdict(lambda: [0, 0, 0, 0])
+        self.applied = {}  # user_id: Balance after apply()
+
+    def add(self, user_id, amount, type, date, sign=1, month=None):
+        # month: month_start(date) if the caller already knows it
+        self.balances[user_id] += sign * Transaction.signed_amount(amount, type)
+        summary = self.summaries[(user_id, month or month_start(date))]
+        if type == Transaction.TypeChoices.INCOME:
+            summary[0] += sign * amount
+            summary[2] += sign
+        elif type == Transaction.TypeChoices.EXPENSE:
+            summary[1] += sign * amount
+            summary[3] += sign
+
+    def apply(self):
+        # returns the new data versions {user_id: version}, the seq of the transactions written after it
+        # balances first: the balance row lock serializes the writes of a user
+        self.applied = {user_id: Balance.apply_delta(user_id, self.balances[user_id])
+                        for user_id in sorted(self.balances)}
+        MonthlySummary.apply_deltas(self.summaries)
+        return {user_id: balance.version for user_id, balance in self.applied.items()}
+
+    def verify(self):
+        # settings.BALANCE_VERIFY: compares the balances with the full recompute, once the transactions are written
+        if settings.BALANCE_VERIFY:
+            for balance in Balance.objects.filter(user_id__in=self.balances).order_by("user_id"):
+                balance.verify_balance_amount()
+                self.applied[balance.user_id] = balance
+
+    def notify(self, created=(), updated=(), deleted=()):
+        # sends transactions_changed with the balances after apply() (e.g. to the event streams of the users)
+        transactions_changed.send(sender=Transaction, balances=self.applied, created=created, updated=updated,
+                                  deleted=deleted)
+
+
+def rebuild_user_data(user_ids):
+    """
+    -Recomputes the balances and monthly summaries of the users from their transactions.
+    -Used after loading transactions without Transaction.save()/bulk_insert() (e.g. imports, COPY).
+    """
+    with transaction.atomic():
+        for user_id in sorted(user_ids):
+            balance, _ = Balance.objects.select_for_update().get_or_create(user_id=user_id)
             balance.update_balance_amount()
+        MonthlySummary.rebuild(user_ids)
@@ -0,0 +1,116 @@
+import base64
+import json
+
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class TransactionCursorPagination(BasePagination):
+    """
+    info :
+        Keyset (cursor) pagination for lists ordered by one column.
+        rows are ordered by (<order_by column>, id) and a page starts right after the (value, id)
+        of the last row of the previous page, so deep pages cost the same as the first one and
+        rows inserted meanwhile do not shift or duplicate the results.
+    query params :
+        cursor: opaque value taken from the "next" link of the previous page
+        page_size: number of rows in a page (default = page_size, max = max_page_size)
+    response :
+        the body is the list of rows (as without pagination),
+        the next page is sent in the header  =>  Link: <url?cursor=...>; rel="next"
+    """
+    page_size = 100
+    max_page_size = 1000
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.get_page(list(self.get_page_queryset(queryset, request)))
+
+    def get_page_queryset(self, queryset, request):
+        """
+        queryset of the rows of the requested page, with one more row to know if there is a next page
+        (used directly by the async views, which evaluate it with async for)
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        # the list is ordered by the view (e.g. ?order_by=date), id is added as tie breaker
+        order_by = queryset.query.order_by[0] if queryset.query.order_by else "id"
+        field = queryset.model._meta.get_field(order_by)
+        self.order_by = order_by
+        self.column = field.attname
+        # the cursor stores the raw column value (e.g. category_id for category)
+        self.cursor_field = field.target_field if field.is_relation else field
+
+        ordering = [F(self.column).asc(nulls_first=True) if field.null else self.column]
+        if self.column != "id":
+            ordering.append("id")
+        queryset = queryset.order_by(*ordering)
+
+        position = self.decode_cursor(request)
+        if position is not None:
+            queryset = queryset.filter(self.get_position_filter(*position))
+        return queryset[:self.page_size + 1]
+
+    def get_page(self, rows):
+        # rows of the page queryset => rows of the page
+        self.has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        self.next_position = self.get_row_position(rows[-1]) if self.has_next else None
+        return rows
+
+    def get_paginated_response(self, data):
+        headers = {}
+        if next_url := self.get_next_link():
+            headers["Link"] = f'<{next_url}>; rel="next"'
+        return Response(data, headers=headers)
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_position_filter(self, value, last_id):
+        # rows after (value, last_id) in (column, id) order, null values come first
+        if self.column == "id":
+            return Q(id__gt=last_id)
+        if value is None:
+            return Q(**{f"{self.column}__isnull": True, "id__gt": last_id}) | Q(**{f"{self.column}__isnull": False})
+        return Q(**{f"{self.column}__gt": value}) | Q(**{self.column: value, "id__gt": last_id})
+
+    def get_row_position(self, row):
+        return getattr(row, self.column), row.id
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(*self.next_position))
+
+    def encode_cursor(self, value, last_id):
+        if value is not None and not isinstance(value, (int, str)):
+            value = value.isoformat()  # datetime
+        data = json.dumps({"o": self.order_by, "v": value, "id": last_id}, separators=(",", ":"))
+        return base64.urlsafe_b64encode(data.encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            # a cursor of another ordering does not point to a position in this one
+            if data["o"] != self.order_by:
+                raise ValueError
+            value = None if data["v"] is None else self.cursor_field.to_python(data["v"])
+            return value, int(data["id"])
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
@@ -1,4 +1,5 @@
-from rest_framework import serializers
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
 
 from cash_managemnet.models import Transaction
 
@@ -8,12 +9,19 @@ class TransactionSerializer(serializers.ModelSerializer):
     info: serializer for registering the Transaction,
     model: models.Transaction
     selected_fields = id, amount, type, category, date
+    fields: optional list of the fields to use (sparse fieldset), e.g. TransactionSerializer(transaction, fields=["id"])
     """
 
     class Meta:
         model = Transaction
         fields = ["id", "amount", "type", "category", "date"]  # model fields
 
+    def __init__(self, *args, fields=None, **kwargs):
+        super(TransactionSerializer, self).__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields).difference(fields):
+                self.fields.pop(name)
+
     def create(self, validated_data):
         """
         overriding create method to save current user as Transaction owner
@@ -21,3 +29,71 @@ class TransactionSerializer(serializers.ModelSerializer):
         validated_data["user"] = self.context["request"].user
         transaction = super(TransactionSerializer, self).create(validated_data)
         return transaction
+
+
+def datetime_representation(field):
+    """
+    returns a function equal to field.to_representation (a serializers.DateTimeField) for many values:
+    the output format and the timezone are looked up once instead of once per value
+    """
+    output_format = getattr(field, "format", api_settings.DATETIME_FORMAT)
+    field_timezone = field.timezone if hasattr(field, "timezone") else field.default_timezone()
+    if output_format is None or output_format.lower() != ISO_8601 or field_timezone is None:
+        return field.to_representation
+
+    def to_representation(value):
+        if not value or value.tzinfo is None:
+            return field.to_representation(value)
+        value = value.astimezone(field_timezone).isoformat()
+        return value[:-6] + "Z" if value.endswith("+00:00") else value
+
+    return to_representation
+
+
+class TransactionRowSerializer:
+    """
+    info: read only, fast version of TransactionSerializer(many=True) for lists,
+        the rows are fetched with values_list (no model instances) and converted to dicts directly
+        instead of field by field, the data (and so the response) is the same as TransactionSerializer.
+        fields: optional list of the fields to use, in the order of TransactionSerializer.Meta.fields
+    usage:
+        rows = TransactionRowSerializer.get_rows(queryset)  # values_list queryset
+        TransactionRowSerializer(rows).data                 # == TransactionSerializer(queryset, many=True).data
+        TransactionRowSerializer(TransactionRowSerializer.get_rows(queryset, ["id", "amount"]), ["id", "amount"]).data
+    """
+    columns = ["id", "amount", "type", "category_id", "date"]  # column of each of TransactionSerializer.Meta.fields
+
+    def __init__(self, rows, fields=None):
+        self.rows = rows
+        self.fields = fields
+
+    @classmethod
+    def get_rows(cls, queryset, fields=None):
+        # named rows of the columns of the fields (first, in the same order),
+        # with the id and ordering columns too (read by the pagination cursor)
+        if fields is None:
+            columns = list(cls.columns)
+        else:
+            column_of = dict(zip(TransactionSerializer.Meta.fields, cls.columns))
+            columns = [column_of[name] for name in fields]
+            if "id" not in columns:
+                columns.append("id")
+        for order_by in queryset.query.order_by:
+            column = queryset.model._meta.get_field(order_by.lstrip("-")).attname
+            if column not in columns:
+                columns.append(column)
+        return queryset.values_list(*columns, named=True)
+
+    @property
+    def data(self):
+        date = datetime_representation(TransactionSerializer().fields["date"])
+        if self.fields is None:
+            return [
+                {"id": row[0], "amount": row[1], "type": row[2], "category": row[3], "date": date(row[4])}
+                for row in self.rows
+            ]
+        # the first values of a row are the values of the fields
+        if "date" not in self.fields:
+            return [dict(zip(self.fields, row)) for row in self.rows]
+        date_index = self.fields.index("date")
+        return [dict(zip(self.fields, row), date=date(row[date_index])) for row in self.rows]
@@ -1,14 +1,34 @@
+from django.conf import settings
 from django.urls import path
 
+from cash_managemnet import async_views
 from cash_managemnet.views import CreateTransactionView, UpdateTransactionView, DeleteTransactionView, \
-    GetTransactionView, GetAllTransactionView, GenerateReportMonthly
+    GetTransactionView, GetAllTransactionView, GenerateReportMonthly, BulkCreateTransactionView, \
+    ExportTransactionView, SyncTransactionView, BalanceView, BalanceAsOfView
 
 urlpatterns = [
     path("insert-transaction", CreateTransactionView.as_view(), name="insert-transaction"),
+    path("bulk-insert-transaction", BulkCreateTransactionView.as_view(), name="bulk-insert-transaction"),
     path("update-transaction/<int:pk>", UpdateTransactionView.as_view(), name="update-transaction"),
     path("delete-transaction/<int:pk>", DeleteTransactionView.as_view(), name="delete-transaction"),
     path("transaction/<int:pk>", GetTransactionView.as_view(), name="transaction"),
     path("transaction/", GetAllTransactionView.as_view(), name="all-transaction"),
-    path("report", GenerateReportMonthly.as_view(), name='report')
+    path("export-transaction", ExportTransactionView.as_view(), name="export-transaction"),
+    path("sync-transaction", SyncTransactionView.as_view(), name="sync-transaction"),
+    path("report", GenerateReportMonthly.as_view(), name='report'),
+    path("balance", BalanceView.as_view(), name="balance"),
+    path("balance-as-of", BalanceAsOfView.as_view(), name="balance-as-of"),
+    path("events", async_views.AsyncTransactionEventsView.as_view(), name="events"),
 
 ]
+
+if settings.ASYNC_VIEWS:
+    # the same urls served by the async views (see config.async_views.AsyncAPIView)
+    urlpatterns = [
+        path("transaction/<int:pk>", async_views.AsyncGetTransactionView.as_view(), name="transaction"),
+        path("transaction/", async_views.AsyncGetAllTransactionView.as_view(), name="all-transaction"),
+        path("report", async_views.AsyncGenerateReportMonthly.as_view(), name='report'),
+        path("balance", async_views.AsyncBalanceView.as_view(), name="balance"),
+        path("export-transaction", async_views.AsyncExportTransactionView.as_view(), name="export-transaction"),
+    ] + [pattern for pattern in urlpatterns
+         if pattern.name not in ["transaction", "all-transaction", "report", "balance", "export-transaction"]]
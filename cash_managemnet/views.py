@@ -1,12 +1,24 @@
-from django.db.models import Sum, Q
-from django.db.models.functions import TruncMonth
+import base64
+import heapq
+import json
+from itertools import islice
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from rest_framework import serializers
+from rest_framework.exceptions import NotFound, PermissionDenied
 from rest_framework.generics import CreateAPIView, UpdateAPIView, DestroyAPIView, RetrieveAPIView, ListAPIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from cash_managemnet.models import Transaction
-from cash_managemnet.serializers import TransactionSerializer
+from cash_managemnet.mixins import ConditionalGetMixin, TransactionFilterMixin, SparseFieldsMixin, \
+    TransactionExportMixin
+from cash_managemnet.models import Transaction, MonthlySummary, DeletedTransaction, Balance
+from cash_managemnet.pagination import TransactionCursorPagination
+from cash_managemnet.serializers import TransactionSerializer, TransactionRowSerializer
 
 
 class CreateTransactionView(CreateAPIView):
@@ -29,6 +41,49 @@ class CreateTransactionView(CreateAPIView):
     serializer_class = TransactionSerializer
 
 
+class BulkCreateTransactionView(CreateAPIView):
+    """
+    url : /bulk-insert-transaction
+    info : Creates a list of Transactions in one request (e.g. bank-statement imports)
+        each item is validated like /insert-transaction, the whole list is saved or nothing.
+        the balance is adjusted once for the list.
+    headers =
+        Content-Type : application/json
+        Authorization : Token <token>
+    method: POST
+    request body:
+        [
+            {"amount": 200, "type": "E", category": 1, "date": "2023-08-18T16:32:59.594691Z"},
+            {"amount": 100, "type": "I"}
+            ...
+        ]
+    response body:
+        [
+            {"id":1, "amount": 200, "type": "E", category": 1, "date": "2023-08-18T16:32:59.594691Z"},
+            {"id":2, "amount": 100, "type": "I", category": null, "date": "2023-08-18T16:40:00.000000Z"}
+            ...
+        ]
+    """
+
+    permission_classes = [IsAuthenticated, ]
+    model = Transaction
+    serializer_class = TransactionSerializer
+    max_items = 10000  # max number of transactions in one request
+    batch_size = 1000  # number of rows inserted per query
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs["many"] = True
+        kwargs["allow_empty"] = False
+        kwargs["max_length"] = self.max_items
+        return super(BulkCreateTransactionView, self).get_serializer(*args, **kwargs)
+
+    def perform_create(self, serializer):
+        # bypass serializer.save() which would call Transaction.save() once per item
+        user = self.request.user
+        transactions = [Transaction(user=user, **data) for data in serializer.validated_data]
+        serializer.instance = Transaction.bulk_insert(transactions, batch_size=self.batch_size)
+
+
 class UpdateTransactionView(UpdateAPIView):
     """
     url : /update-transaction/<int:pk>
@@ -68,13 +123,15 @@ class DeleteTransactionView(DestroyAPIView):
         return Transaction.objects.filter(user=self.request.user)
 
 
-class GetTransactionView(RetrieveAPIView):
+class GetTransactionView(ConditionalGetMixin, SparseFieldsMixin, RetrieveAPIView):
     """
     url : /transaction/<int:pk>
     info : Genetic View to get Transaction with id provided
+            transaction/1?fields=id,amount   =>   only id and amount (see mixins.SparseFieldsMixin)
     headers =
         Content-Type : application/json
         Authorization : Token <token>
+        If-None-Match : "<etag>" (optional, 304 when the data of the user has not changed)
     method: GET
     response body:
         {"id":1, "amount": 200, "type": "E", category": 1, "date": "2023-08-18T16:32:59.594691Z"}
@@ -85,10 +142,10 @@ class GetTransactionView(RetrieveAPIView):
 
     def get_queryset(self):
         # User should not access other's transactions.
-        return Transaction.objects.filter(user=self.request.user)
+        return self.sparse_queryset(Transaction.objects.filter(user=self.request.user))
 
 
-class GetAllTransactionView(ListAPIView):
+class GetAllTransactionView(ConditionalGetMixin, TransactionFilterMixin, SparseFieldsMixin, ListAPIView):
     """
     url : /transaction
     info : Get user all transactions with query params lookups(if needed)
@@ -98,9 +155,15 @@ class GetAllTransactionView(ListAPIView):
             transaction?date__lt=2020-02-20T20:20:20   =>    Transaction.objects.filter(date__lt=2020-02-20T20:20:20)
             transaction?date__gt=2020-02-20T20:20:20   =>    Transaction.objects.filter(date__gt=2019-01-19T19:19:19)
         ****transaction?q1=val1&q2=val2...     =>   Transaction.objects.filter(q'1=val1 , q'2=val2, ...)
+            transaction?order_by=date   =>    ordered by (date, id)
+            transaction?fields=id,amount   =>   only id and amount (see mixins.SparseFieldsMixin)
+    pagination : keyset pagination (see pagination.TransactionCursorPagination)
+            transaction?page_size=50   =>    first 50 transactions (default = 100, max = 1000)
+            the next page url is in the response header  =>  Link: <...?cursor=...>; rel="next"
     headers =
         Content-Type : application/json
         Authorization : Token <token>
+        If-None-Match : "<etag>" (optional, 304 when the data of the user has not changed)
     method: GET
     response body:
     [
@@ -112,36 +175,192 @@ class GetAllTransactionView(ListAPIView):
     permission_classes = [IsAuthenticated, ]
     model = Transaction
     serializer_class = TransactionSerializer
+    pagination_class = TransactionCursorPagination
+    fast_serialization = True  # rows serialized by TransactionRowSerializer (same response, less cpu)
 
     def get_queryset(self):
         # User should not access other's transactions.
         return Transaction.objects.filter(user=self.request.user)
 
-    def filter_queryset(self, queryset):
-        # the function to apply query params in the result
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        if not self.fast_serialization:
+            page = self.paginate_queryset(self.sparse_queryset(queryset))
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        fields = self.get_sparse_fields()
+        page = self.paginate_queryset(TransactionRowSerializer.get_rows(queryset, fields))
+        return self.get_paginated_response(TransactionRowSerializer(page, fields).data)
 
-        filter_lookups = {}
-        # extract params from the url
-        for name, value in Transaction.filtering_lookups:  # filtering_lookup in .models/Transaction model
-            param = self.request.GET.get(value)
-            if param:
-                filter_lookups[name] = param
 
-        order_by = self.request.GET.get("order_by")
-        # check if order_by value is a valid field name (default = id)
-        if order_by is None or order_by not in [f.name for f in self.model._meta.get_fields()]:
-            order_by = "id"
-        # apply all lookups found in url
-        return queryset.filter(**filter_lookups).order_by(order_by)
+class SyncTransactionView(ConditionalGetMixin, APIView):
+    """
+    url : /sync-transaction
+    info : Change feed for offline clients: the transactions created or updated and the ids of the
+        transactions deleted since a cursor, ordered by change sequence (see models.Transaction.seq),
+        so a client only downloads what changed since its last sync.
+            sync-transaction                  =>  all the transactions (first sync, no deletes)
+            sync-transaction?cursor=<cursor>  =>  the changes after the cursor of the previous response
+        the client stores the cursor of each response and asks again while has_more is true.
+    query params :
+        cursor: the cursor of the previous response
+        page_size: maximum number of changes (transactions + deletes) in a response (default = 500, max = 5000)
+    headers =
+        Content-Type : application/json
+        Authorization : Token <token>
+        If-None-Match : "<etag>" (optional, 304 when the data of the user has not changed)
+    method: GET
+    response body:
+        {
+            "changes": [{"id":1, "amount": 200, "type": "E", category": 1, "date": "2023-08-18T16:32:59.594691Z"}],
+            "deleted": [7, 9],
+            "cursor": "eyJzIjoxMiwiaWQiOjl9",
+            "has_more": false
+        }
+    """
+    permission_classes = [IsAuthenticated, ]
+    page_size = 500
+    max_page_size = 5000
+    invalid_cursor_message = "Invalid cursor"
+
+    def get(self, request):
+        cursor = request.GET.get("cursor")
+        seq, last_id = self.decode_cursor(cursor) if cursor else (0, 0)
+        page_size = self.get_page_size(request)
+
+        # at most page_size + 1 changes of each kind, merged by (seq, id)
+        rows = TransactionRowSerializer.get_rows(
+            Transaction.objects.filter(Q(seq__gt=seq) | Q(seq=seq, id__gt=last_id), user=request.user)
+            .order_by("seq", "id"))[:page_size + 1]
+        changes = [(row.seq, row.id, row) for row in rows]
+        if cursor:  # a first sync has nothing to delete
+            deleted = DeletedTransaction.objects.filter(
+                Q(seq__gt=seq) | Q(seq=seq, transaction_id__gt=last_id), user=request.user,
+            ).order_by("seq", "transaction_id").values_list("seq", "transaction_id")[:page_size + 1]
+            changes = heapq.merge(changes, [(*position, None) for position in deleted], key=itemgetter(0, 1))
+        changes = list(islice(changes, page_size + 1))
+
+        has_more = len(changes) > page_size
+        changes = changes[:page_size]
+        if changes:
+            seq, last_id = changes[-1][:2]
+        return Response({
+            "changes": TransactionRowSerializer([row for _, _, row in changes if row is not None]).data,
+            "deleted": [transaction_id for _, transaction_id, row in changes if row is None],
+            "cursor": self.encode_cursor(seq, last_id),
+            "has_more": has_more,
+        }, status=200)
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.GET.get("page_size", self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    @staticmethod
+    def encode_cursor(seq, last_id):
+        data = json.dumps({"s": seq, "id": last_id}, separators=(",", ":"))
+        return base64.urlsafe_b64encode(data.encode()).decode()
+
+    def decode_cursor(self, encoded):
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            return int(data["s"]), int(data["id"])
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+
+class BalanceView(ConditionalGetMixin, APIView):
+    """
+    url : /balance
+    info : Balance of the user, read from models.Balance (maintained by every write) with one indexed lookup
+            balance?verify=1   =>   (admin users only) also compares it with the full recompute from the transactions
+    headers =
+        Content-Type : application/json
+        Authorization : Token <token>
+        If-None-Match : "<etag>" (optional, 304 when the data of the user has not changed, not for verify=1)
+    method: GET
+    response body:
+        {"amnt": 300, "version": 12}
+        {"amnt": 300, "version": 12, "verify": {"expected": 300, "ok": true}}   (verify=1)
+    """
+    permission_classes = [IsAuthenticated, ]
+
+    def get_data_version(self):
+        # the amount is read with the data version (ETag), in the same query
+        if not hasattr(self, "_data_version"):
+            self.balance = self.get_balance(self.request.user.id)
+            self._data_version = self.balance["version"]
+        return self._data_version
+
+    def get_etag(self, request):
+        # verify checks the data behind the version, it is never answered with 304
+        if self.is_verify(request):
+            return None
+        return super(BalanceView, self).get_etag(request)
+
+    def get(self, request):
+        if self.is_verify(request) and not request.user.is_staff:
+            raise PermissionDenied("verify is only available to admin users")
+        self.get_data_version()
+        data = dict(self.balance)
+        if self.is_verify(request):
+            data["verify"] = self.verify(data["amnt"], Balance(user_id=request.user.id).compute_balance_amount())
+        return Response(data, status=200)
+
+    @staticmethod
+    def get_balance(user_id):
+        # {"amnt": ..., "version": ...}, zero before the first write of the user
+        return Balance.objects.filter(user_id=user_id).values("amnt", "version").first() or {"amnt": 0, "version": 0}
+
+    @staticmethod
+    def is_verify(request):
+        return request.GET.get("verify") in ("1", "true")
+
+    @staticmethod
+    def verify(amnt, expected):
+        return {"expected": expected, "ok": amnt == expected}
+
+
+class BalanceAsOfView(ConditionalGetMixin, APIView):
+    """
+    url : /balance-as-of
+    info : Balance of the user at a date, with the transactions until the date (included)
+            balance-as-of?date=2023-03-10T00:00:00Z
+        read from the monthly balance snapshots (see models.MonthlySummary.balance_as_of), so its cost is bounded
+        by one month of transactions
+    headers =
+        Content-Type : application/json
+        Authorization : Token <token>
+        If-None-Match : "<etag>" (optional, 304 when the data of the user has not changed)
+    method: GET
+    response body:
+        {"date": "2023-03-10T00:00:00Z", "amnt": 300}
+    """
+    permission_classes = [IsAuthenticated, ]
+
+    def get(self, request):
+        field = serializers.DateTimeField()
+        try:
+            date = field.to_internal_value(request.GET.get("date") or field.fail("required"))
+        except serializers.ValidationError as error:
+            raise serializers.ValidationError({"date": error.detail})
+        amnt = MonthlySummary.balance_as_of(request.user.id, date)
+        return Response({"date": field.to_representation(date), "amnt": amnt}, status=200)
 
 
-class GenerateReportMonthly(APIView):
+class GenerateReportMonthly(ConditionalGetMixin, APIView):
     """
     url : /report
-    info : Generates monthly reports of expenses and incomes of the user
+    info : Generates monthly reports of expenses and incomes of the user, ordered by month
+        the report is read from the monthly summaries, so its cost depends on the number of months
+        responses are cached per user, date filters and data version (see models.Balance.version)
     headers =
         Content-Type : application/json
         Authorization : Token <token>
+        If-None-Match : "<etag>" (optional, 304 when the data of the user has not changed)
     method: GET
     response body:
         [
@@ -159,18 +378,74 @@ class GenerateReportMonthly(APIView):
             /report?date__gt=2018-08-18T18:18:18 =>    e.g. Transaction.incomes.filter(date_gt=2018-08-18T18:18:18)
         *** /report?date__gt=...&date_lt=...
         """
+        filter_lookups = self.get_filter_lookups(request.GET)
+        # the cache key contains the data version of the user, a write makes the old entries unreachable
+        version = self.get_data_version()
+        cache_key = self.get_cache_key(request.user.id, version, filter_lookups)
+        transactions = cache.get(cache_key)
+        if transactions is None:
+            # monthly incomes and expenses, read from the monthly summaries (see models.MonthlySummary)
+            transactions = MonthlySummary.report(request.user.id, **filter_lookups)
+            cache.set(cache_key, transactions, settings.REPORT_CACHE_TIMEOUT)
+
+        return Response(transactions, status=200)
+
+    @staticmethod
+    def get_filter_lookups(request_args):
         expected_args = ["date__lt", "date__gt"]
         filter_lookups = {}
-        request_args = request.GET
         # extract params from the url
         for arg in expected_args:
             if value := request_args.get(arg):
-                filter_lookups[arg] = value
-        # get income and expense transactions
-        transactions = Transaction.objects.filter(user=request.user, **filter_lookups).annotate(
-            month=TruncMonth("date")).values("month").annotate(
-            expenses=Sum("amount", filter=Q(type=Transaction.TypeChoices.EXPENSE)),
-            incomes=Sum("amount", filter=Q(type=Transaction.TypeChoices.INCOME)),
-        ).values("month", "expenses", "incomes")
+                try:
+                    filter_lookups[arg] = serializers.DateTimeField().to_internal_value(value)
+                except serializers.ValidationError as error:
+                    raise serializers.ValidationError({arg: error.detail})
+        return filter_lookups
 
-        return Response(transactions, status=200)
+    @staticmethod
+    def get_cache_key(user_id, version, filter_lookups):
+        date__gt, date__lt = filter_lookups.get("date__gt"), filter_lookups.get("date__lt")
+        return "report:{}:{}:{}:{}".format(user_id, version, date__gt and date__gt.isoformat(),
+                                           date__lt and date__lt.isoformat())
+
+
+class ExportTransactionView(TransactionExportMixin, APIView):
+    """
+    url : /export-transaction
+    info : Streams all transactions of the user as a file, with the same query params as /transaction
+            export-transaction?export_format=csv&type=E&order_by=date
+        rows are read from the database in chunks and written while they are read,
+        so the memory does not depend on the number of transactions.
+        (under ASGI django reads a sync iterator whole before sending it, the export is served there by
+        async_views.AsyncExportTransactionView, see settings.ASYNC_VIEWS)
+    query params :
+        export_format: csv (default) or ndjson (one json object per line)
+        filtering_lookups and order_by of /transaction
+    headers =
+        Content-Type : application/json
+        Authorization : Token <token>
+    method: GET
+    response body (csv):
+        id,amount,type,category,date
+        1,200,E,1,2023-08-18T16:32:59.594691Z
+    response body (ndjson):
+        {"id":1,"amount":200,"type":"E","category":1,"date":"2023-08-18T16:32:59.594691Z"}
+    """
+    permission_classes = [IsAuthenticated, ]
+
+    def get(self, request):
+        export_format = self.get_export_format()
+        rows = self.get_rows().iterator(chunk_size=self.chunk_size)
+        return self.streaming_response(self.lines(rows, *self.get_line_format(export_format)), export_format)
+
+    def lines(self, rows, first_line, format_row):
+        # the lines of a chunk of rows are sent together
+        lines = [first_line] if first_line else []
+        for row in rows:
+            lines.append(format_row(row))
+            if len(lines) >= self.chunk_size:
+                yield b"".join(lines)
+                lines = []
+        if lines:
+            yield b"".join(lines)
@@ -0,0 +1,69 @@
+import io
+
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import exceptions
+
+from accounts.authentication import CachedTokenAuthentication
+from config.fast_json import FastJSONParser, FastJSONRenderer
+
+
+class AsyncAPIView(View):
+    """
+    info :
+        Base of the async views (used when settings.ASYNC_VIEWS is on).
+        They run on the event loop of the ASGI server with the async ORM instead of the sync DRF views
+        which are run in a thread pool.
+        -token authentication (CachedTokenAuthentication), 401 if not authenticated
+            (authentication_required = False for public views e.g. login)
+        -DRF exceptions (e.g. NotFound, ValidationError) are returned as json like DRF does
+        -csrf exempt like the DRF views
+    usage :
+        class MyView(AsyncAPIView):
+            async def get(self, request): ...
+    """
+    http_method_names = ["get"]
+    authentication = CachedTokenAuthentication()
+    authentication_required = True
+    media_type = "application/json"
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        view.csrf_exempt = True  # csrf_exempt() would hide that the view is async
+        return view
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            if self.authentication_required:
+                credentials = await self.authentication.aauthenticate(request)
+                if credentials is None:
+                    raise exceptions.NotAuthenticated()
+                request.user, request.auth = credentials
+            return await self.handle(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            response = self.json_response(self.error_detail(exc), status=exc.status_code)
+            if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+                response["WWW-Authenticate"] = self.authentication.authenticate_header(request)
+            if getattr(exc, "wait", None):
+                response["Retry-After"] = str(exc.wait)
+            return response
+
+    async def handle(self, request, *args, **kwargs):
+        # calls the method handler (get, post, ...), subclasses can wrap it
+        return await super().dispatch(request, *args, **kwargs)
+
+    @staticmethod
+    def error_detail(exc):
+        # same body as the DRF exception handler
+        if isinstance(exc.detail, (list, dict)):
+            return exc.detail
+        return {"detail": exc.detail}
+
+    @staticmethod
+    def parse_json(request):
+        # request body as python data, like the DRF views
+        return FastJSONParser().parse(io.BytesIO(request.body or b"{}"))
+
+    def json_response(self, data, status=200):
+        return HttpResponse(FastJSONRenderer().render(data), content_type=self.media_type, status=status)
@@ -0,0 +1,183 @@
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connections
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# sent to the subscriptions which may have missed messages (slow client, lost connection to the backend)
+RESYNC = {"resync": True}
+
+
+class Subscription:
+    """
+    info :
+        messages published to one user for one stream (e.g. an SSE response), in a bounded queue
+        on the event loop of the stream. When the queue is full the messages are dropped and
+        `overflowed` is set, the stream should tell its client to resync.
+    usage :
+        async with broker.subscribe(user_id) as subscription:
+            message = await subscription.get(timeout=15)  # None after 15 seconds without message
+    """
+
+    def __init__(self, broker, user_id, maxsize):
+        self.broker = broker
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+        self.overflowed = False
+
+    def put(self, message):
+        # runs on the event loop of the subscription
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self, timeout=None):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def clear(self):
+        # drops the queued messages, after an overflow
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.overflowed = False
+
+    async def __aenter__(self):
+        self.broker.add(self)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.broker.remove(self)
+
+
+class InProcessBroker:
+    """
+    info :
+        Pub/sub of the messages of the users inside one process (e.g. one uvicorn worker).
+        publish() can be called from any thread (e.g. a sync view), the message is delivered to the
+        subscriptions of the user on their event loops.
+        With several worker processes, use a backend shared by the processes (PostgresBroker).
+    usage :
+        EVENTS_BACKEND = "config.events.InProcessBroker"
+        get_broker().publish(user_id, {"balance": 100})
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions = defaultdict(set)
+
+    def subscribe(self, user_id):
+        return Subscription(self, user_id, settings.EVENTS_QUEUE_SIZE)
+
+    def add(self, subscription):
+        with self.lock:
+            self.subscriptions[subscription.user_id].add(subscription)
+
+    def remove(self, subscription):
+        with self.lock:
+            subscriptions = self.subscriptions.get(subscription.user_id, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self.subscriptions.pop(subscription.user_id, None)
+
+    def publish(self, user_id, message):
+        self.deliver(user_id, message)
+
+    def deliver(self, user_id, message):
+        # to the subscriptions of the user in this process (all the users if user_id is None)
+        with self.lock:
+            if user_id is None:
+                subscriptions = [subscription for user in self.subscriptions.values() for subscription in user]
+            else:
+                subscriptions = list(self.subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, message)
+            except RuntimeError:  # the event loop of the stream is closed
+                self.remove(subscription)
+
+
+class PostgresBroker(InProcessBroker):
+    """
+    info :
+        Pub/sub shared by all the worker processes (and servers) through PostgreSQL LISTEN/NOTIFY.
+        publish() sends a NOTIFY on `channel`, one thread per process (started with the first subscription)
+        LISTENs on a dedicated connection and delivers the messages to the subscriptions of the process.
+        -messages larger than the NOTIFY payload limit are replaced by RESYNC
+        -after a lost listener connection the subscriptions of the process get RESYNC
+    usage :
+        EVENTS_BACKEND = "config.events.PostgresBroker"
+    """
+    channel = "qmp_events"
+    max_payload = 7999  # bytes, NOTIFY payloads are limited to 8000 bytes
+    poll_timeout = 5  # seconds
+
+    def __init__(self, using="default"):
+        super(PostgresBroker, self).__init__()
+        self.using = using
+        self.listener = None
+
+    @staticmethod
+    def encode(user_id, message, max_payload):
+        payload = json.dumps({"user_id": user_id, "message": message}, separators=(",", ":"))
+        if len(payload.encode()) > max_payload:
+            payload = json.dumps({"user_id": user_id, "message": RESYNC}, separators=(",", ":"))
+        return payload
+
+    def publish(self, user_id, message):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [self.channel, self.encode(user_id, message, self.max_payload)])
+
+    def add(self, subscription):
+        super(PostgresBroker, self).add(subscription)
+        with self.lock:
+            if self.listener is None:
+                self.listener = threading.Thread(target=self.listen, name="events-listener", daemon=True)
+                self.listener.start()
+
+    def listen(self):
+        # runs in the listener thread, reconnects after errors
+        reconnect = False
+        while True:
+            try:
+                wrapper = connections.create_connection(self.using)
+                connection = wrapper.get_new_connection(wrapper.get_connection_params())
+                connection.autocommit = True
+                with connection.cursor() as cursor:
+                    cursor.execute(f'LISTEN "{self.channel}"')
+                if reconnect:
+                    self.deliver(None, RESYNC)
+                while True:
+                    if select.select([connection], [], [], self.poll_timeout)[0]:
+                        connection.poll()
+                        while connection.notifies:
+                            data = json.loads(connection.notifies.pop(0).payload)
+                            self.deliver(data["user_id"], data["message"])
+            except Exception:
+                logger.exception("events listener connection failed, reconnecting")
+                reconnect = True
+                time.sleep(1)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    # the broker of the process, settings.EVENTS_BACKEND
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = import_string(settings.EVENTS_BACKEND)()
+        return _broker
@@ -0,0 +1,73 @@
+import io
+
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # optional, without it the renderer and the parser are the DRF ones
+    orjson = None
+
+# datetimes are written like rest_framework.utils.encoders.JSONEncoder (isoformat, +00:00 as Z)
+ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS if orjson else 0
+# orjson reads integers larger than 64 bits as floats, documents with such numbers are parsed by the json module
+# (searched with bytes.translate, much faster than a regular expression)
+DIGITS = bytes.maketrans(b"0123456789", b"0" * 10)
+LARGE_NUMBER = b"0" * 19
+
+
+def default(obj):
+    # types orjson does not serialize natively (Decimal, timedelta, lazy strings, ...), as DRF does
+    return encoders.JSONEncoder().default(obj)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    info :
+        JSONRenderer using orjson when it is installed, the output is the same as JSONRenderer
+        (compact, utf-8, datetimes as DRF, \\u2028 and \\u2029 escaped) except that NaN and
+        infinite floats are rendered as null instead of raising an error.
+        Falls back to JSONRenderer without orjson, for indented output (e.g. the browsable api,
+        Accept: application/json; indent=4), for non compact / ascii settings (COMPACT_JSON, UNICODE_JSON)
+        and for data orjson can not serialize (e.g. integers larger than 64 bits).
+    usage :
+        REST_FRAMEWORK = {"DEFAULT_RENDERER_CLASSES": ["config.fast_json.FastJSONRenderer", ...]}
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or not self.compact or self.ensure_ascii or \
+                self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super(FastJSONRenderer, self).render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super(FastJSONRenderer, self).render(data, accepted_media_type, renderer_context)
+        # the same escaping as JSONRenderer (a strict javascript subset)
+        return ret.replace("\u2028".encode(), b"\\u2028").replace("\u2029".encode(), b"\\u2029")
+
+
+class FastJSONParser(JSONParser):
+    """
+    info :
+        JSONParser using orjson when it is installed (utf-8 requests).
+        Invalid documents and documents with integers larger than 64 bits are parsed by JSONParser,
+        so the results and the error messages are the same as JSONParser.
+    usage :
+        REST_FRAMEWORK = {"DEFAULT_PARSER_CLASSES": ["config.fast_json.FastJSONParser", ...]}
+    """
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        if orjson is None or encoding.lower().replace("-", "") != "utf8":
+            return super(FastJSONParser, self).parse(stream, media_type, parser_context)
+        data = stream.read()
+        if LARGE_NUMBER in data.translate(DIGITS):
+            return super(FastJSONParser, self).parse(io.BytesIO(data), media_type, parser_context)
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            return super(FastJSONParser, self).parse(io.BytesIO(data), media_type, parser_context)
@@ -0,0 +1,207 @@
+import bisect
+import contextvars
+import glob
+import json
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
+
+from config.slow_queries import log_slow_queries
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+# name : (type, label names, histogram buckets, help)
+METRICS = {
+    "qmp_requests_total": (
+        "counter", ("route", "method", "status"), None, "Requests by url name, method and status code."),
+    "qmp_request_duration_seconds": (
+        "histogram", ("route", "method"), DURATION_BUCKETS, "Request latency in seconds."),
+    "qmp_db_queries": (
+        "histogram", ("route", "method"), QUERY_BUCKETS, "Database queries per request."),
+    "qmp_db_duration_seconds": (
+        "histogram", ("route", "method"), DURATION_BUCKETS, "Time spent in database queries per request."),
+    "qmp_response_size_bytes": (
+        "histogram", ("route", "method"), SIZE_BUCKETS, "Response body size (streaming responses excluded)."),
+}
+
+
+class RequestStats:
+    # database usage of the current request, filled by count_queries
+    # log: list of the (sql, params, duration) of the request when it is profiled (see config.profiling)
+    __slots__ = ("request", "queries", "db_time", "log")
+
+    def __init__(self, request=None):
+        self.request = request
+        self.queries = 0
+        self.db_time = 0.0
+        self.log = None
+
+
+current_request_stats = contextvars.ContextVar("current_request_stats", default=None)
+
+
+def count_queries(execute, sql, params, many, context):
+    # database execute wrapper, counts the queries and their time for the current request (if any)
+    stats = current_request_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - start
+        stats.queries += 1
+        stats.db_time += duration
+        if stats.log is not None:
+            stats.log.append((sql, params, duration))
+
+
+def install_query_wrappers(connection, **kwargs):
+    # connections are per thread, the wrappers are added once to each of them
+    for wrapper in [count_queries, log_slow_queries]:
+        if wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.append(wrapper)
+
+
+def install_on_open_connections():
+    for connection in connections.all(initialized_only=True):
+        install_query_wrappers(connection)
+
+
+connection_created.connect(install_query_wrappers)
+
+
+class MetricsRegistry:
+    """
+    info :
+        In-process aggregation of the request metrics collected by middlewares.collect_metrics,
+        rendered in the Prometheus text format by the /metrics view.
+        Each series is a list of numbers: [value] for counters, bucket counts + [sum] for histograms.
+        With settings.METRICS_DIR every process (e.g. gunicorn worker) writes its series to that directory
+        (at most every METRICS_DUMP_INTERVAL seconds) and /metrics returns the sum over all processes.
+    usage :
+        registry.observe_request("report", "GET", 200, duration=0.01, queries=2, db_time=0.004, size=120)
+        registry.render()
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.series = {}  # (name, labels) -> list of numbers
+        self.last_dump = 0.0
+
+    def inc(self, name, labels, value=1):
+        key = (name, labels)
+        if key not in self.series:
+            self.series[key] = [0]
+        self.series[key][0] += value
+
+    def observe(self, name, labels, value):
+        key = (name, labels)
+        buckets = METRICS[name][2]
+        if key not in self.series:
+            self.series[key] = [0] * (len(buckets) + 2)
+        series = self.series[key]
+        # per bucket (not cumulative) counts, the last count is for +Inf
+        series[bisect.bisect_left(buckets, value)] += 1
+        series[-1] += value
+
+    def observe_request(self, route, method, status, duration, queries, db_time, size):
+        labels = (route, method)
+        with self.lock:
+            self.inc("qmp_requests_total", (route, method, str(status)))
+            self.observe("qmp_request_duration_seconds", labels, duration)
+            self.observe("qmp_db_queries", labels, queries)
+            self.observe("qmp_db_duration_seconds", labels, db_time)
+            if size is not None:
+                self.observe("qmp_response_size_bytes", labels, size)
+        if settings.METRICS_DIR and time.monotonic() - self.last_dump > settings.METRICS_DUMP_INTERVAL:
+            self.dump(settings.METRICS_DIR)
+
+    def snapshot(self):
+        with self.lock:
+            return {key: list(values) for key, values in self.series.items()}
+
+    def reset(self):
+        with self.lock:
+            self.series.clear()
+
+    def dump(self, directory, name=None):
+        # replaces the file of this process (<pid>.json) atomically, so readers never see a partial file
+        self.last_dump = time.monotonic()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{name or os.getpid()}.json")
+        rows = [[name, list(labels), values] for (name, labels), values in self.snapshot().items()]
+        with open(path + ".tmp", "w") as file:
+            json.dump(rows, file)
+        os.replace(path + ".tmp", path)
+
+    @staticmethod
+    def load(directory):
+        # the series of all processes, summed
+        series = {}
+        for path in glob.glob(os.path.join(directory, "*.json")):
+            with open(path) as file:
+                for name, labels, values in json.load(file):
+                    key = (name, tuple(labels))
+                    if key in series:
+                        series[key] = [a + b for a, b in zip(series[key], values)]
+                    else:
+                        series[key] = values
+        return series
+
+    def render(self):
+        if settings.METRICS_DIR:
+            self.dump(settings.METRICS_DIR)
+            series = self.load(settings.METRICS_DIR)
+        else:
+            series = self.snapshot()
+
+        lines = []
+        for name, (metric_type, label_names, buckets, help_text) in METRICS.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for (series_name, labels), values in sorted(series.items()):
+                if series_name != name:
+                    continue
+                label_text = ",".join(f'{label}="{escape(value)}"' for label, value in zip(label_names, labels))
+                if metric_type == "counter":
+                    lines.append(f"{name}{{{label_text}}} {format_value(values[0])}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(buckets + ("+Inf",), values):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+                lines.append(f"{name}_sum{{{label_text}}} {format_value(values[-1])}")
+                lines.append(f"{name}_count{{{label_text}}} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+registry = MetricsRegistry()
+
+
+@require_GET
+def metrics_view(request):
+    """
+    url : /metrics
+    info : request metrics of the api in the Prometheus text format (see MetricsRegistry)
+    method: GET
+    response content-type :
+        text/plain; version=0.0.4
+    """
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,20 +1,111 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
 from django.http.response import HttpResponseNotFound
+from django.utils.decorators import sync_and_async_middleware
 
 from config import settings
+from config.metrics import RequestStats, current_request_stats, install_on_open_connections, registry
+from config.profiling import RequestProfile, can_profile
+
+
+def is_blocked(request):
+    # True for requests with content-type not application/json out of settings.ALLOWED_JSON_URLS
+    base_url = request.path[1:].split("/")[0]
+    return request.content_type != "application/json" and base_url not in settings.ALLOWED_JSON_URLS
 
 
+@sync_and_async_middleware
 def block_non_json_request(get_response):
     """
     block the request with content-type not application/json
     In settings.ALLOWED_JSON_URLS you can add exception to pass reeuest.
+    It is sync and async capable, so under ASGI the async views stay on the event loop.
     """
 
-    def middleware(request):
-        base_url = request.path[1:].split("/")[0]
-        if request.content_type != "application/json":
-            if base_url not in settings.ALLOWED_JSON_URLS:
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            if is_blocked(request):
                 return HttpResponseNotFound()
-        response = get_response(request)
-        return response
+            return await get_response(request)
+    else:
+        def middleware(request):
+            if is_blocked(request):
+                return HttpResponseNotFound()
+            response = get_response(request)
+            return response
+
+    return middleware
+
+
+def record_metrics(request, response, start, stats):
+    # the url name (e.g. "all-transaction") groups the requests, "unmatched" for unknown urls
+    resolver_match = request.resolver_match
+    route = resolver_match.view_name if resolver_match else "unmatched"
+    size = None if response.streaming else len(response.content)
+    registry.observe_request(route, request.method, response.status_code, time.perf_counter() - start,
+                             stats.queries, stats.db_time, size)
+
+
+@sync_and_async_middleware
+def collect_metrics(get_response):
+    """
+    records latency, database queries and time, response size and status code of every request,
+    per url name, in config.metrics.registry (exposed at /metrics).
+    It is the first middleware, so the time of the other middlewares is included.
+    """
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            start, stats = time.perf_counter(), RequestStats(request)
+            # the context (and so the stats) is copied to the threads running the sync database code
+            token = current_request_stats.set(stats)
+            try:
+                response = await get_response(request)
+            finally:
+                current_request_stats.reset(token)
+            record_metrics(request, response, start, stats)
+            return response
+    else:
+        def middleware(request):
+            start, stats = time.perf_counter(), RequestStats(request)
+            install_on_open_connections()
+            token = current_request_stats.set(stats)
+            try:
+                response = get_response(request)
+            finally:
+                current_request_stats.reset(token)
+            record_metrics(request, response, start, stats)
+            return response
+
+    return middleware
+
+
+@sync_and_async_middleware
+def profile_request(get_response):
+    """
+    runs the request under cProfile when it has the X-Profile header (value: 1 or a sort key
+    cumulative/tottime/calls) and is sent by a staff user or settings.PROFILING_ENABLED is on.
+    see config.profiling.RequestProfile for the results
+    It is after AuthenticationMiddleware, requests without the header only pay for the header lookup.
+    """
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            if not request.headers.get("X-Profile") or not await sync_to_async(can_profile)(request):
+                return await get_response(request)
+            profile = RequestProfile(request)
+            profile.start()
+            response = await get_response(request)
+            return profile.stop(response)
+    else:
+        def middleware(request):
+            if not can_profile(request):
+                return get_response(request)
+            install_on_open_connections()
+            profile = RequestProfile(request)
+            profile.start()
+            response = get_response(request)
+            return profile.stop(response)
 
     return middleware
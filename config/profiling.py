@@ -0,0 +1,107 @@
+import cProfile
+import io
+import os
+import pstats
+import time
+import uuid
+
+from django.conf import settings
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from config.metrics import RequestStats, current_request_stats
+
+PROFILE_HEADER = "X-Profile"
+SORT_KEYS = ["cumulative", "tottime", "calls"]
+
+
+def can_profile(request):
+    """
+    True if the request asks to be profiled (X-Profile header) and is allowed to:
+    settings.PROFILING_ENABLED (e.g. on a staging server) or a staff user.
+    The user is authenticated early with the DRF authenticators, the view authenticates again as usual.
+    """
+    if not request.headers.get(PROFILE_HEADER):
+        return False
+    if settings.PROFILING_ENABLED:
+        return True
+    drf_request = Request(request)
+    for authenticator in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        try:
+            credentials = authenticator().authenticate(drf_request)
+        except exceptions.APIException:
+            return False
+        if credentials is not None:
+            return credentials[0].is_staff
+    return False
+
+
+class RequestProfile:
+    """
+    info :
+        Profiles one request with cProfile and records its SQL statements with their timings.
+        The results are written to settings.PROFILE_DIR:
+            <id>.prof : raw cProfile stats (python -m pstats <id>.prof, snakeviz, ...)
+            <id>.txt  : the sorted stats and the SQL statements
+        and summarized in the response headers:
+            X-Profile-Id, X-Profile-Duration (seconds), X-Profile-Queries, X-Profile-Db-Time (seconds)
+        Under ASGI only the event loop thread is profiled (sync code in sync_to_async threads is not),
+        the SQL statements of those threads are recorded.
+    usage :
+        profile = RequestProfile(request)
+        profile.start()
+        response = get_response(request)
+        profile.stop(response)
+    """
+
+    def __init__(self, request):
+        self.request = request
+        sort = request.headers.get(PROFILE_HEADER, "").lower()
+        self.sort = sort if sort in SORT_KEYS else "cumulative"
+        self.profiler = cProfile.Profile()
+
+    def start(self):
+        # the statements are recorded by config.metrics.count_queries, in the stats of the request
+        self.stats = current_request_stats.get()
+        self.token = None
+        if self.stats is None:  # metrics middleware not installed
+            self.stats = RequestStats(self.request)
+            self.token = current_request_stats.set(self.stats)
+        self.stats.log = []
+        self.started = time.perf_counter()
+        self.profiler.enable()
+
+    def stop(self, response):
+        self.profiler.disable()
+        self.duration = time.perf_counter() - self.started
+        statements, self.stats.log = self.stats.log, None
+        if self.token is not None:
+            current_request_stats.reset(self.token)
+
+        resolver_match = self.request.resolver_match
+        route = resolver_match.view_name if resolver_match else "unmatched"
+        # unique: several requests of a route can be profiled in the same second by a process
+        profile_id = "{}-{}-{}-{}".format(time.strftime("%Y%m%d-%H%M%S"), route.replace(":", "-"), os.getpid(),
+                                          uuid.uuid4().hex[:8])
+        os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+        path = os.path.join(settings.PROFILE_DIR, profile_id)
+        self.profiler.dump_stats(path + ".prof")
+        with open(path + ".txt", "w") as file:
+            file.write(self.report(statements))
+
+        response["X-Profile-Id"] = profile_id
+        response["X-Profile-Duration"] = f"{self.duration:.6f}"
+        response["X-Profile-Queries"] = str(len(statements))
+        response["X-Profile-Db-Time"] = f"{sum(duration for _, _, duration in statements):.6f}"
+        return response
+
+    def report(self, statements, limit=60):
+        output = io.StringIO()
+        output.write(f"{self.request.method} {self.request.get_full_path()}  {self.duration:.6f}s\n\n")
+        pstats.Stats(self.profiler, stream=output).sort_stats(self.sort).print_stats(limit)
+        output.write(f"\n{len(statements)} SQL statements "
+                     f"({sum(duration for _, _, duration in statements):.6f}s):\n")
+        for sql, params, duration in statements:
+            output.write(f"\n[{duration:.6f}s] {sql}\n    params: {params!r}\n")
+        return output.getvalue()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -44,6 +45,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'config.middlewares.collect_metrics',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -52,6 +54,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'config.middlewares.profile_request',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -88,6 +91,17 @@ DATABASES = {
     }
 }
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# locmem is per process, use a shared backend (e.g. redis/memcached) with several workers
+
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.environ.get("CACHE_LOCATION", ""),
+    }
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -130,8 +144,67 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',  # added for token based authentication
+        'accounts.authentication.CachedTokenAuthentication',  # token based authentication with cached tokens
+    ],
+    # json with orjson when it is installed, the DRF json renderer and parser otherwise (see config.fast_json)
+    'DEFAULT_RENDERER_CLASSES': [
+        'config.fast_json.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'config.fast_json.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
 }
 
-ALLOWED_JSON_URLS = ["admin"]
+ALLOWED_JSON_URLS = ["admin", "metrics", "events"]
+
+# directory shared by the worker processes to merge their /metrics (None = metrics of the answering process only)
+METRICS_DIR = os.environ.get("METRICS_DIR") or None
+# seconds between two writes of the metrics of a process to METRICS_DIR
+METRICS_DUMP_INTERVAL = float(os.environ.get("METRICS_DUMP_INTERVAL", 5))
+
+# profile any request with the X-Profile header, not only the requests of staff users (see config.profiling)
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "0").lower() in ("1", "true", "yes")
+# directory of the request profiles
+PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "qmp-profiles"))
+
+# statements slower than SLOW_QUERY_THRESHOLD seconds are logged with their plan (config.slow_queries logger),
+# SLOW_QUERY_SAMPLE_RATE of them (0 disables the log) and at most SLOW_QUERY_MAX_PER_MINUTE per minute and process
+SLOW_QUERY_THRESHOLD = float(os.environ.get("SLOW_QUERY_THRESHOLD", 0.2))
+SLOW_QUERY_SAMPLE_RATE = float(os.environ.get("SLOW_QUERY_SAMPLE_RATE", 1))
+SLOW_QUERY_MAX_PER_MINUTE = int(os.environ.get("SLOW_QUERY_MAX_PER_MINUTE", 30))
+SLOW_QUERY_EXPLAIN = os.environ.get("SLOW_QUERY_EXPLAIN", "1").lower() in ("1", "true", "yes")
+
+# serve /transaction, /transaction/<pk>, /report, login and signup with the async views (ASGI deployment)
+ASYNC_VIEWS = os.environ.get("ASYNC_VIEWS", "0").lower() in ("1", "true", "yes")
+
+# password hashing of the async login/signup views: threads, and requests waiting for a thread before 503
+PASSWORD_HASHING_WORKERS = int(os.environ.get("PASSWORD_HASHING_WORKERS", 2))
+PASSWORD_HASHING_QUEUE = int(os.environ.get("PASSWORD_HASHING_QUEUE", 16))
+
+# seconds a token -> user resolution is cached by CachedTokenAuthentication (only with a shared cache backend)
+TOKEN_CACHE_TIMEOUT = int(os.environ.get("TOKEN_CACHE_TIMEOUT", 60))
+
+# compare every incremental balance update against the full recompute (slow, for debugging drifts)
+BALANCE_VERIFY = os.environ.get("BALANCE_VERIFY", "0").lower() in ("1", "true", "yes")
+
+# seconds a /report response is cached (it is keyed by the user data version, so it is never stale)
+REPORT_CACHE_TIMEOUT = int(os.environ.get("REPORT_CACHE_TIMEOUT", 60 * 60))
+
+# pub/sub of the /events streams: config.events.InProcessBroker (one process) or
+# config.events.PostgresBroker (LISTEN/NOTIFY, shared by the gunicorn workers, default with PostgreSQL:
+# with the in-process broker a stream would miss the writes handled by the other workers)
+EVENTS_BACKEND = os.environ.get("EVENTS_BACKEND", "config.events.PostgresBroker"
+                                if DATABASES["default"]["ENGINE"].startswith("django.db.backends.postgresql")
+                                else "config.events.InProcessBroker")
+# messages waiting for a slow /events client before it is asked to resync
+EVENTS_QUEUE_SIZE = int(os.environ.get("EVENTS_QUEUE_SIZE", 100))
+# transactions of one write sent as events, larger writes (bulk inserts) are sent as a resync
+EVENTS_MAX_TRANSACTIONS = int(os.environ.get("EVENTS_MAX_TRANSACTIONS", 100))
+# seconds between two keep-alive comments of an idle /events stream
+EVENTS_HEARTBEAT = float(os.environ.get("EVENTS_HEARTBEAT", 15))
+# seconds after which an /events stream is closed (the client reconnects with Last-Event-ID),
+# streams of disconnected clients are only released then
+EVENTS_STREAM_TIMEOUT = float(os.environ.get("EVENTS_STREAM_TIMEOUT", 5 * 60))
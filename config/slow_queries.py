@@ -0,0 +1,100 @@
+import contextvars
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject, empty
+
+logger = logging.getLogger(__name__)
+
+# True while the plan of a slow statement is fetched, its own EXPLAIN is not logged
+explaining = contextvars.ContextVar("explaining", default=False)
+
+
+class RateLimiter:
+    """
+    token bucket: at most `per_minute` events per minute (with bursts up to `per_minute`)
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tokens = None
+        self.updated = time.monotonic()
+
+    def allow(self, per_minute):
+        with self.lock:
+            now = time.monotonic()
+            if self.tokens is None:
+                self.tokens = per_minute
+            self.tokens = min(per_minute, self.tokens + (now - self.updated) * per_minute / 60)
+            self.updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+rate_limiter = RateLimiter()
+
+
+def request_context(request):
+    # (url name, user id) of the request, without querying the database
+    if request is None:
+        return None, None
+    resolver_match = request.resolver_match
+    view = resolver_match.view_name if resolver_match else None
+    user = request.__dict__.get("user")
+    if isinstance(user, SimpleLazyObject):
+        # the session user of AuthenticationMiddleware, only used if it was already loaded
+        user = None if user._wrapped is empty else user._wrapped
+    return view, getattr(user, "id", None)
+
+
+def explain(connection, sql, params):
+    # query plan of the statement, EXPLAIN (EXPLAIN QUERY PLAN on SQLite)
+    # run on the raw cursor, so the execute wrappers (metrics, this log) do not see it
+    token = explaining.set(True)
+    try:
+        with connection.cursor() as cursor:
+            cursor.cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}", params)
+            rows = cursor.cursor.fetchall()
+    except Exception as error:
+        return f"EXPLAIN failed: {error}"
+    finally:
+        explaining.reset(token)
+    if connection.vendor == "sqlite":
+        return "\n".join(str(row[-1]) for row in rows)
+    return "\n".join(" ".join(str(column) for column in row) for row in rows)
+
+
+def log_slow_queries(execute, sql, params, many, context):
+    """
+    database execute wrapper (installed on every connection with config.metrics.install_query_wrappers)
+    Logs the statements slower than settings.SLOW_QUERY_THRESHOLD seconds with the view and the user of the
+    request and the query plan of SELECT statements, to the config.slow_queries logger (warning).
+    A fraction (settings.SLOW_QUERY_SAMPLE_RATE) of the slow statements is logged,
+    at most settings.SLOW_QUERY_MAX_PER_MINUTE per minute and per process.
+    """
+    start = time.perf_counter()
+    result = execute(sql, params, many, context)
+    duration = time.perf_counter() - start
+    if duration < settings.SLOW_QUERY_THRESHOLD or explaining.get():
+        return result
+    if random.random() >= settings.SLOW_QUERY_SAMPLE_RATE or not rate_limiter.allow(settings.SLOW_QUERY_MAX_PER_MINUTE):
+        return result
+
+    # imported here, config.metrics installs this wrapper
+    from config.metrics import current_request_stats
+    stats = current_request_stats.get()
+    view, user_id = request_context(stats and stats.request)
+    plan = None
+    if settings.SLOW_QUERY_EXPLAIN and not many and sql.lstrip()[:6].upper() == "SELECT":
+        plan = explain(context["connection"], sql, params)
+    # params are left out, they hold tokens and password hashes
+    logger.warning(
+        "slow query %.3fs view=%s user=%s\n%s\nplan:\n%s", duration, view, user_id, sql, plan,
+        extra={"duration": duration, "view": view, "user_id": user_id, "sql": sql, "plan": plan},
+    )
+    return result
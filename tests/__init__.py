@@ -0,0 +1,14 @@
+import atexit
+import shutil
+import tempfile
+
+# a cache shared by the worker processes, for the tests counting queries of requests authenticated from the
+# token cache (the token resolutions are not cached in the per-process locmem cache,
+# see accounts.authentication.get_token_cache)
+SHARED_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": tempfile.mkdtemp(prefix="qmp-test-cache-"),
+    }
+}
+atexit.register(shutil.rmtree, SHARED_CACHES["default"]["LOCATION"], ignore_errors=True)
@@ -0,0 +1,162 @@
+import asyncio
+import threading
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import include, path, reverse
+from rest_framework.authtoken.admin import User
+from rest_framework.authtoken.models import Token
+
+from accounts import async_views as accounts_async_views, hashing
+from cash_managemnet import async_views
+from cash_managemnet.models import Transaction, Balance
+
+# the async views on their own urls, to compare them with the DRF views
+urlpatterns = [
+    path("async/transaction/<int:pk>", async_views.AsyncGetTransactionView.as_view(), name="async-transaction"),
+    path("async/transaction/", async_views.AsyncGetAllTransactionView.as_view(), name="async-all-transaction"),
+    path("async/report", async_views.AsyncGenerateReportMonthly.as_view(), name="async-report"),
+    path("async/balance", async_views.AsyncBalanceView.as_view(), name="async-balance"),
+    path("async/export-transaction", async_views.AsyncExportTransactionView.as_view(), name="async-export-transaction"),
+    path("async/accounts/login", accounts_async_views.AsyncLoginView.as_view(), name="async-login"),
+    path("async/accounts/signup", accounts_async_views.AsyncSignupView.as_view(), name="async-signup"),
+    path("accounts/", include("accounts.urls")),
+    path("", include("cash_managemnet.urls")),
+]
+
+
+@override_settings(ROOT_URLCONF="tests.test_async_views")
+class TestAsyncViews(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="keyvan", password="123456")
+        self.token = Token.objects.create(user=self.user).key
+        self.headers = {"Authorization": f"Token {self.token}"}
+        for index in range(5):
+            Transaction.objects.create(user=self.user, amount=100 + index, type="IE"[index % 2],
+                                       date=f"2023-0{index + 1}-10T10:00:00Z")
+        self.transaction = Transaction.objects.create(user=self.user, amount=7, type="I", date="2023-02-11T10:00:00Z")
+
+    async def _get(self, url, data=None):
+        # "Content-Type" in headers is sent as content_type by AsyncRequestFactory, so it is passed as extra
+        return await self.async_client.get(url, data or {}, headers=self.headers,
+                                           **{"content-type": "application/json"})
+
+    async def _compare(self, name, async_name, args=None, data=None):
+        sync_response = await self._get(reverse(name, args=args), data)
+        async_response = await self._get(reverse(async_name, args=args), data)
+        self.assertEqual(async_response.status_code, sync_response.status_code)
+        self.assertEqual(async_response.content, sync_response.content, f"{async_name} should return the same body")
+        return sync_response, async_response
+
+    async def test_detail_same_as_drf(self):
+        await self._compare("transaction", "async-transaction", args=[self.transaction.id])
+        _, response = await self._compare("transaction", "async-transaction", args=[987654])
+        self.assertEqual(response.status_code, 404)
+
+    async def test_list_same_as_drf(self):
+        await self._compare("all-transaction", "async-all-transaction", data={"type": "E", "order_by": "amount"})
+        sync_response, async_response = await self._compare("all-transaction", "async-all-transaction",
+                                                            data={"page_size": 2, "order_by": "date"})
+        self.assertEqual(async_response["Link"].replace("/async", ""), sync_response["Link"],
+                         "next page links should match")
+
+    async def test_sparse_fields_same_as_drf(self):
+        await self._compare("transaction", "async-transaction", args=[self.transaction.id], data={"fields": "amount"})
+        await self._compare("all-transaction", "async-all-transaction",
+                            data={"fields": "date,id", "page_size": 2, "order_by": "amount"})
+        _, response = await self._compare("all-transaction", "async-all-transaction", data={"fields": "user"})
+        self.assertEqual(response.status_code, 400)
+
+    async def test_report_same_as_drf(self):
+        await self._compare("report", "async-report")
+        await self._compare("report", "async-report", data={"date__gt": "2023-02-11T00:00:00Z"})
+        _, response = await self._compare("report", "async-report", data={"date__gt": "blabla"})
+        self.assertEqual(response.status_code, 400)
+
+    async def test_balance_same_as_drf(self):
+        await self._compare("balance", "async-balance")
+        _, response = await self._compare("balance", "async-balance", data={"verify": 1})
+        self.assertEqual(response.status_code, 403)
+        await User.objects.filter(id=self.user.id).aupdate(is_staff=True)
+        await cache.aclear()  # the authenticated user is cached with the token
+        await Balance.objects.filter(user=self.user).aupdate(amnt=1)
+        _, response = await self._compare("balance", "async-balance", data={"verify": 1})
+        self.assertFalse(response.json()["verify"]["ok"])
+
+    async def test_export_streamed_in_chunks(self):
+        sync_response = await self._get(reverse("export-transaction"), {"export_format": "ndjson", "type": "I"})
+        sync_content = await sync_to_async(b"".join)(sync_response.streaming_content)
+        with mock.patch.object(async_views.AsyncExportTransactionView, "chunk_size", 2):
+            response = await self._get(reverse("async-export-transaction"), {"export_format": "ndjson", "type": "I"})
+            self.assertTrue(response.is_async, "the export should be an async iterator, not read whole by django")
+            chunks = [chunk async for chunk in response.streaming_content]
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertEqual([chunk.count(b"\n") for chunk in chunks], [2, 2], "rows should be sent chunk by chunk")
+        self.assertEqual(b"".join(chunks), sync_content, "the async export should be the same file")
+
+        response = await self._get(reverse("async-export-transaction"), {"export_format": "xml"})
+        self.assertEqual(response.status_code, 400)
+
+    async def test_not_authenticated(self):
+        self.headers["Authorization"] = "Token blabla"
+        _, response = await self._compare("all-transaction", "async-all-transaction")
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response["WWW-Authenticate"], "Token")
+
+    async def test_conditional_get(self):
+        response = await self._get(reverse("async-all-transaction"))
+        self.headers["If-None-Match"] = response["ETag"]
+        response = await self._get(reverse("async-all-transaction"))
+        self.assertEqual(response.status_code, 304)
+
+
+@override_settings(ROOT_URLCONF="tests.test_async_views")
+class TestAsyncAccountViews(TestCase):
+
+    def setUp(self):
+        User.objects.create_user(username="keyvan", password="123456")
+
+    async def _post(self, url, data):
+        return await self.async_client.post(url, data, content_type="application/json")
+
+    async def _compare(self, name, async_name, data):
+        sync_response = await self._post(reverse(name), data)
+        async_response = await self._post(reverse(async_name), data)
+        self.assertEqual(async_response.status_code, sync_response.status_code)
+        self.assertEqual(async_response.content, sync_response.content, f"{async_name} should return the same body")
+        return async_response
+
+    async def test_login_same_as_drf(self):
+        response = await self._compare("login", "async-login", {"username": "keyvan", "password": "123456"})
+        self.assertEqual(response.json()["token"], (await Token.objects.aget(user__username="keyvan")).key)
+        for data in [{"username": "keyvan", "password": "wrong"}, {"username": "nobody", "password": "123456"},
+                     {"username": "keyvan"}]:
+            response = await self._compare("login", "async-login", data)
+            self.assertEqual(response.status_code, 400, f"login with {data} should fail")
+
+    async def test_signup_same_as_drf(self):
+        response = await self._post(reverse("async-signup"), {"username": "ali", "password": "123456"})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json(), {"username": "ali"})
+        user = await User.objects.aget(username="ali")
+        self.assertTrue(user.check_password("123456"), "the password should be saved hashed")
+        # duplicate username
+        await self._compare("signup", "async-signup", {"username": "keyvan", "password": "123456"})
+
+    async def test_saturated_executor_returns_503(self):
+        executor = hashing.BoundedExecutor(max_workers=1, max_pending=0)
+        release = threading.Event()
+        blocked = asyncio.ensure_future(executor.run(release.wait))
+        await asyncio.sleep(0)
+        try:
+            with mock.patch.object(hashing, "executor", executor):
+                response = await self._post(reverse("async-login"), {"username": "keyvan", "password": "123456"})
+        finally:
+            release.set()
+            await blocked
+        self.assertEqual(response.status_code, 503, "requests over the hashing capacity should fail fast")
+        self.assertEqual(response["Retry-After"], "1")
@@ -0,0 +1,90 @@
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.admin import User
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from accounts.authentication import CachedTokenAuthentication
+from tests import SHARED_CACHES
+
+
+@override_settings(CACHES=SHARED_CACHES)
+class TestCachedTokenAuthentication(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="keyvan", password="123456")
+        self.token = Token.objects.create(user=self.user).key
+
+    def _get(self, url):
+        return self.client.get(url, headers={"Authorization": f"Token {self.token}",
+                                             "Content-Type": "application/json"})
+
+    def test_token_lookup_is_cached(self):
+        self.assertEqual(self._get(reverse("all-transaction")).status_code, 200)
+        with self.assertNumQueries(2):  # data version and transactions, no token query
+            self.assertEqual(self._get(reverse("all-transaction")).status_code, 200)
+
+    def test_logout_invalidates_cached_token(self):
+        self.assertEqual(self._get(reverse("all-transaction")).status_code, 200)
+        self.assertEqual(self._get(reverse("logout")).status_code, 200)
+        self.assertEqual(self._get(reverse("all-transaction")).status_code, 401,
+                         "a logged out token should not be accepted from the cache")
+
+    def test_deactivation_invalidates_cached_token(self):
+        self.assertEqual(self._get(reverse("all-transaction")).status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self._get(reverse("all-transaction")).status_code, 401,
+                         "a deactivated user should not be accepted from the cache")
+
+    def test_bad_token_is_not_cached(self):
+        self.token = "blabla"
+        self.assertEqual(self._get(reverse("all-transaction")).status_code, 401)
+        self.assertEqual(self._get(reverse("all-transaction")).status_code, 401)
+
+
+class TestTokenCacheAcrossWorkers(TestCase):
+    """
+    two worker processes are simulated with two cache instances
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="keyvan", password="123456")
+        self.token = Token.objects.create(user=self.user)
+        self.key = self.token.key
+
+    def _authenticate(self, worker_cache):
+        with mock.patch("accounts.authentication.caches", {"default": worker_cache}):
+            return CachedTokenAuthentication().authenticate_credentials(self.key)
+
+    def _logout(self, worker_cache):
+        with mock.patch("accounts.authentication.caches", {"default": worker_cache}):
+            self.token.delete()
+
+    def _check_logout_seen_by_other_worker(self, first, second):
+        self.assertEqual(self._authenticate(first)[0], self.user)
+        self.assertEqual(self._authenticate(second)[0], self.user)
+        self._logout(first)
+        with self.assertRaises(AuthenticationFailed, msg="a token deleted in a worker should fail in the others"):
+            self._authenticate(second)
+
+    def test_per_process_cache_not_used(self):
+        first, second = LocMemCache("worker-1", {}), LocMemCache("worker-2", {})
+        self._check_logout_seen_by_other_worker(first, second)
+        self.assertEqual(first._cache, {}, "tokens should not be cached in a per-process cache")
+
+    def test_shared_cache(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        first, second = FileBasedCache(directory.name, {}), FileBasedCache(directory.name, {})
+        self._authenticate(first)
+        with self.assertNumQueries(0):
+            self._authenticate(second)
+        self._check_logout_seen_by_other_worker(first, second)
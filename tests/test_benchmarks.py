@@ -0,0 +1,47 @@
+from django.test import TestCase
+
+from benchmarks.run import Benchmark, compare, percentile
+
+
+class TestBenchmarks(TestCase):
+
+    def test_run_all_scenarios(self):
+        results = Benchmark(size=50, iterations=2).run()
+        self.assertIn("list date__gt", results)
+        for name, result in results.items():
+            self.assertTrue(all(status < 400 for status in result["status"]), f"{name} should not fail")
+            self.assertGreater(result["queries"], 0)
+            self.assertLessEqual(result["p50_ms"], result["p95_ms"])
+
+    def test_seeded_data_is_reproducible(self):
+        from cash_managemnet.models import Transaction, Balance, MonthlySummary
+
+        Benchmark(size=30, iterations=1)
+        first = list(Transaction.objects.filter(user__username="benchmark-30").values_list("amount", "type", "date"))
+        Transaction.objects.filter(user__username="benchmark-30").delete()
+        Benchmark(size=30, iterations=1)
+        second = list(Transaction.objects.filter(user__username="benchmark-30").values_list("amount", "type", "date"))
+        self.assertEqual(first, second, "every run should benchmark the same data")
+
+        # the rollups of the first seed should not be counted again
+        balance = Balance.objects.get(user__username="benchmark-30")
+        self.assertEqual(balance.amnt, balance.compute_balance_amount(), "the balance should match the new seed")
+        summaries = set(MonthlySummary.objects.filter(user=balance.user_id).values_list(
+            "month", "income_total", "expense_total", "income_count", "expense_count", "opening_balance"))
+        MonthlySummary.rebuild([balance.user_id])
+        self.assertEqual(set(MonthlySummary.objects.filter(user=balance.user_id).values_list(
+            "month", "income_total", "expense_total", "income_count", "expense_count", "opening_balance")), summaries,
+            "the monthly summaries should match the new seed")
+
+    def test_compare_with_baseline(self):
+        baseline = {"1000/list": {"p50_ms": 10, "p95_ms": 20, "queries": 2}}
+        self.assertEqual(compare({"1000/list": {"p50_ms": 11.9, "p95_ms": 23, "queries": 2}}, baseline, 0.2), [])
+        regressions = compare({"1000/list": {"p50_ms": 12.1, "p95_ms": 20, "queries": 3},
+                               "1000/report": {"p50_ms": 1, "p95_ms": 1, "queries": 1}}, baseline, 0.2)
+        self.assertEqual(regressions, ["1000/list: p50_ms 10 -> 12.1", "1000/list: queries 2 -> 3"])
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 95), 95)
+        self.assertEqual(percentile([7], 95), 7)
@@ -0,0 +1,143 @@
+import asyncio
+import json
+import threading
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.admin import User
+from rest_framework.authtoken.models import Token
+
+from cash_managemnet.models import Transaction
+from config import events
+from config.events import InProcessBroker, PostgresBroker, RESYNC
+from config.metrics import install_on_open_connections
+
+
+class TestInProcessBroker(TestCase):
+
+    async def test_publish_from_another_thread(self):
+        broker = InProcessBroker()
+        async with broker.subscribe(1) as subscription, broker.subscribe(2) as other:
+            thread = threading.Thread(target=broker.publish, args=(1, {"balance": 5}))
+            thread.start()
+            thread.join()
+            self.assertEqual(await subscription.get(timeout=1), {"balance": 5})
+            self.assertIsNone(await other.get(timeout=0.01), "other users should not get the message")
+        self.assertEqual(broker.subscriptions, {}, "subscriptions should be removed when the stream ends")
+
+    @override_settings(EVENTS_QUEUE_SIZE=2)
+    async def test_overflow(self):
+        broker = InProcessBroker()
+        async with broker.subscribe(1) as subscription:
+            for index in range(3):
+                broker.publish(1, {"index": index})
+            await asyncio.sleep(0)
+            self.assertTrue(subscription.overflowed, "a full queue should mark the subscription")
+            subscription.clear()
+            self.assertFalse(subscription.overflowed)
+            self.assertIsNone(await subscription.get(timeout=0.01))
+
+    def test_postgres_payload_limit(self):
+        self.assertEqual(json.loads(PostgresBroker.encode(1, {"balance": 5}, 100)),
+                         {"user_id": 1, "message": {"balance": 5}})
+        self.assertEqual(json.loads(PostgresBroker.encode(1, {"balance": "x" * 200}, 100)),
+                         {"user_id": 1, "message": RESYNC}, "large messages should be replaced by a resync")
+
+
+class TestPublishTransactionChanges(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username="keyvan")
+        patcher = mock.patch("cash_managemnet.events.get_broker")
+        self.publish = patcher.start().return_value.publish
+        self.addCleanup(patcher.stop)
+
+    def test_create_update_delete(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            transaction = Transaction.objects.create(user=self.user, amount=100, type="I")
+        message = self.publish.call_args.args[1]
+        self.assertEqual((message["balance"], message["transactions"][0]["action"]), (100, "created"))
+        self.assertEqual(message["transactions"][0]["transaction"]["id"], transaction.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            transaction.amount = 30
+            transaction.save()
+        self.assertEqual(self.publish.call_args.args[1]["transactions"][0]["action"], "updated")
+
+        transaction_id = transaction.id
+        with self.captureOnCommitCallbacks(execute=True):
+            transaction.delete()
+        self.assertEqual(self.publish.call_args.args, (self.user.id, {
+            "version": 3, "balance": 0, "transactions": [{"action": "deleted", "id": transaction_id}]}))
+
+    def test_published_after_commit_only(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            Transaction.objects.create(user=self.user, amount=100, type="I")
+        self.publish.assert_not_called()
+        self.assertEqual(len(callbacks), 1)
+
+    @override_settings(EVENTS_MAX_TRANSACTIONS=2)
+    def test_large_bulk_insert_is_a_resync(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Transaction.bulk_insert([Transaction(user=self.user, amount=1, type="I") for _ in range(3)])
+        self.assertEqual(self.publish.call_args.args[1], {"version": 1, "balance": 3, "resync": True})
+
+
+class TestTransactionEventsView(TestCase):
+
+    def setUp(self):
+        install_on_open_connections()
+        events._broker = None
+        self.addCleanup(setattr, events, "_broker", None)
+        self.user = User.objects.create_user(username="keyvan", password="123456")
+        self.headers = {"Authorization": f"Token {Token.objects.create(user=self.user).key}"}
+        Transaction.objects.create(user=self.user, amount=100, type="I")
+
+    async def _events(self, response, count):
+        # the next count events (blank line separated), keep-alive comments included
+        chunks = []
+        for _ in range(count):
+            chunks.append(await asyncio.wait_for(anext(response.streaming_content), 2))
+        return [chunk.decode() for chunk in chunks]
+
+    @sync_to_async
+    def _write(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Transaction.objects.create(user=self.user, amount=40, type="E")
+
+    async def test_stream_balance_and_transactions(self):
+        response = await self.async_client.get(reverse("events"), headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        try:
+            first, = await self._events(response, 1)
+            self.assertEqual(first, 'event: balance\nid: 1\ndata: {"amnt":100,"version":1}\n\n')
+            transaction = await self._write()
+            created, balance = await self._events(response, 2)
+            self.assertTrue(created.startswith('event: transaction\ndata: {"action":"created","transaction":{"id":%d'
+                                               % transaction.id), created)
+            self.assertEqual(balance, 'event: balance\nid: 2\ndata: {"amnt":60,"version":2}\n\n')
+        finally:
+            await response.streaming_content.aclose()
+
+    async def test_resync_on_reconnect_after_changes(self):
+        response = await self.async_client.get(reverse("events"), headers={**self.headers, "Last-Event-ID": "0"})
+        try:
+            resync, balance = await self._events(response, 2)
+            self.assertEqual(resync, "event: resync\ndata: {}\n\n")
+            self.assertTrue(balance.startswith("event: balance\nid: 1\n"))
+        finally:
+            await response.streaming_content.aclose()
+
+    @override_settings(EVENTS_HEARTBEAT=0.01, EVENTS_STREAM_TIMEOUT=0.05)
+    async def test_keep_alive_and_timeout(self):
+        response = await self.async_client.get(reverse("events"), headers=self.headers)
+        chunks = [chunk async for chunk in response.streaming_content]
+        self.assertIn(b": keep-alive\n\n", chunks)
+        self.assertEqual(events.get_broker().subscriptions, {}, "the subscription should end with the stream")
+
+    async def test_not_authenticated(self):
+        response = await self.async_client.get(reverse("events"))
+        self.assertEqual(response.status_code, 401)
@@ -0,0 +1,118 @@
+import datetime
+import decimal
+import io
+import uuid
+import zoneinfo
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils.translation import gettext_lazy
+from rest_framework.authtoken.admin import User
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import ErrorDetail, ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.serializer_helpers import ReturnList
+
+from cash_managemnet.models import Transaction
+from config import fast_json
+from config.fast_json import FastJSONRenderer, FastJSONParser
+
+DATA = {
+    "results": ReturnList([
+        {"id": 1, "amount": 200, "type": "E", "category": None, "date": "2023-08-18T16:32:59.594691Z"},
+        {"id": 2, "amount": 2147483647, "type": "I", "category": 3, "date": "2023-08-18T20:02:59+03:30"},
+    ], serializer=None),
+    "next": "http://testserver/transaction?cursor=eyJvIjoiZGF0ZSJ9",
+    "previous": None,
+    "unicode": "تراکنش ✓ \u2028 \u2029 \" \\ \n",
+    "floats": [0.1, 1.5, -2.25],
+    "bools": [True, False],
+    "detail": ErrorDetail("Not found.", code="not_found"),
+    "lazy": gettext_lazy("This field is required."),
+    "datetimes": [
+        datetime.datetime(2023, 1, 1, 10, 0, tzinfo=datetime.timezone.utc),
+        datetime.datetime(2023, 7, 1, 10, 0, 0, 594691, tzinfo=zoneinfo.ZoneInfo("Asia/Tehran")),
+        datetime.datetime(2023, 1, 1, 10, 0, tzinfo=zoneinfo.ZoneInfo("Europe/London")),
+        datetime.datetime(2023, 1, 1, 10, 0, 0, 5),
+    ],
+    "date": datetime.date(2023, 8, 18),
+    "time": datetime.time(16, 32, 59),
+    "timedelta": datetime.timedelta(days=1, seconds=5),
+    "decimal": decimal.Decimal("10.5"),
+    "uuid": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+    1: "integer key",
+}
+
+
+class TestFastJSONRenderer(TestCase):
+
+    def assertSameAsDRF(self, data, media_type=None, renderer_context=None):
+        self.assertEqual(FastJSONRenderer().render(data, media_type, renderer_context),
+                         JSONRenderer().render(data, media_type, renderer_context),
+                         "FastJSONRenderer output should be the same as JSONRenderer")
+
+    def test_same_output_as_drf(self):
+        self.assertSameAsDRF(DATA)
+        self.assertSameAsDRF([])
+        self.assertSameAsDRF("text")
+        self.assertSameAsDRF(None)
+
+    def test_escapes_line_separators(self):
+        self.assertEqual(FastJSONRenderer().render(["\u2028\u2029"]), b'["\\u2028\\u2029"]',
+                         "\\u2028 and \\u2029 should be escaped like JSONRenderer does")
+
+    def test_indent(self):
+        self.assertSameAsDRF(DATA, "application/json; indent=4")
+        self.assertSameAsDRF(DATA, "application/json", {"indent": 2})
+
+    def test_large_integers(self):
+        # orjson only serializes 64 bits integers
+        self.assertSameAsDRF({"amount": 2 ** 70})
+
+    def test_unserializable(self):
+        with self.assertRaises(TypeError, msg="unserializable data should raise like JSONRenderer"):
+            FastJSONRenderer().render({"object": object()})
+
+    def test_without_orjson(self):
+        with mock.patch.object(fast_json, "orjson", None):
+            self.assertSameAsDRF(DATA)
+
+    def test_api_response(self):
+        user = User.objects.create_user(username="keyvan", password="123456")
+        Transaction.objects.create(user=user, amount=100, type="I")
+        headers = {"Authorization": f"Token {Token.objects.create(user=user).key}", "Content-Type": "application/json"}
+        response = self.client.get(reverse("all-transaction"), headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, JSONRenderer().render(response.data),
+                         "api responses should be rendered the same as with JSONRenderer")
+
+
+class TestFastJSONParser(TestCase):
+
+    def parse(self, parser, body, encoding="utf-8"):
+        return parser.parse(io.BytesIO(body), "application/json", {"encoding": encoding})
+
+    def assertSameAsDRF(self, body, encoding="utf-8"):
+        self.assertEqual(self.parse(FastJSONParser(), body, encoding), self.parse(JSONParser(), body, encoding),
+                         "FastJSONParser should parse the same as JSONParser")
+
+    def test_same_result_as_drf(self):
+        self.assertSameAsDRF('{"amount": 200, "type": "E", "category": null, "note": "تراکنش", "rate": 1.5}'.encode())
+        self.assertSameAsDRF(b'[1, 2, 3]')
+        self.assertSameAsDRF(b'{"amount": 12345678901234567890123}')
+        self.assertSameAsDRF('{"note": "تراکنش"}'.encode("utf-16"), encoding="utf-16")
+
+    def test_invalid_json(self):
+        for body in [b'{"amount": ', b'{"amount": NaN}', b'']:
+            with self.assertRaises(ParseError) as fast_error:
+                self.parse(FastJSONParser(), body)
+            with self.assertRaises(ParseError) as drf_error:
+                self.parse(JSONParser(), body)
+            self.assertEqual(fast_error.exception.detail, drf_error.exception.detail,
+                             "the error should be the same as JSONParser")
+
+    def test_without_orjson(self):
+        with mock.patch.object(fast_json, "orjson", None):
+            self.assertSameAsDRF(b'{"amount": 200}')
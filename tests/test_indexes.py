@@ -0,0 +1,64 @@
+import datetime
+from unittest import skipUnless
+
+from django.db import connection
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+from django.test import TestCase
+from rest_framework.authtoken.admin import User
+
+from cash_managemnet.models import Transaction, Category
+
+
+@skipUnless(connection.vendor in ("sqlite", "postgresql"), "query plans are checked on SQLite and Postgres only")
+class TestTransactionQueryPlans(TestCase):
+    """
+    checks that the filtering_lookups, order_by and report queries use the composite indexes
+    of the Transaction model instead of the user foreign key index
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="keyvan")
+        cls.category = Category.objects.create(name="rent")
+        date = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+        Transaction.bulk_insert([
+            Transaction(user=cls.user, amount=index, type="IE"[index % 2], category=cls.category,
+                        date=date + datetime.timedelta(days=index))
+            for index in range(200)
+        ])
+
+    def setUp(self):
+        if connection.vendor == "postgresql":
+            # the test tables are tiny, a sequential scan would always win
+            with connection.cursor() as cursor:
+                cursor.execute("SET enable_seqscan = off")
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan, f"query should use {index_name}, plan: {plan}")
+
+    def test_order_by_date_uses_user_date_index(self):
+        queryset = Transaction.objects.filter(user=self.user, date__gt="2020-03-01T00:00:00Z").order_by("date")
+        self.assertUsesIndex(queryset, "cm_tx_user_date_idx")
+
+    def test_type_filter_uses_user_type_date_index(self):
+        queryset = Transaction.objects.filter(user=self.user, type="E", date__lt="2020-03-01T00:00:00Z")
+        self.assertUsesIndex(queryset, "cm_tx_user_type_date_idx")
+
+    def test_category_filter_uses_user_category_date_index(self):
+        queryset = Transaction.objects.filter(user=self.user, category=self.category, date__gt="2020-03-01T00:00:00Z")
+        self.assertUsesIndex(queryset, "cm_tx_user_category_date_idx")
+
+    def test_amount_filter_uses_user_amount_index(self):
+        queryset = Transaction.objects.filter(user=self.user, amount__gt=150)
+        self.assertUsesIndex(queryset, "cm_tx_user_amount_idx")
+
+    def test_incomes_sum_uses_user_type_date_index(self):
+        queryset = Transaction.incomes.filter(user=self.user).values("amount")
+        self.assertUsesIndex(queryset, "cm_tx_user_type_date_idx")
+
+    def test_report_date_range_uses_user_date_index(self):
+        queryset = Transaction.objects.filter(user=self.user, date__gt="2020-03-01T00:00:00Z").annotate(
+            month=TruncMonth("date")).values("month").annotate(total=Sum("amount"))
+        self.assertUsesIndex(queryset, "cm_tx_user_date_idx")
@@ -0,0 +1,86 @@
+import re
+import tempfile
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.admin import User
+from rest_framework.authtoken.models import Token
+
+from cash_managemnet.models import Transaction
+from config.metrics import MetricsRegistry, install_on_open_connections, registry
+from tests import SHARED_CACHES
+
+
+def sample(text, line_start):
+    # value of the first metrics line starting with line_start
+    match = re.search("^" + re.escape(line_start) + r" (\S+)$", text, re.MULTILINE)
+    return match and float(match.group(1))
+
+
+@override_settings(CACHES=SHARED_CACHES)
+class TestMetrics(TestCase):
+
+    def setUp(self):
+        registry.reset()
+        self.user = User.objects.create_user(username="keyvan", password="123456")
+        self.headers = {"Authorization": f"Token {Token.objects.create(user=self.user).key}",
+                        "Content-Type": "application/json"}
+        for amount in [100, 200, 300]:
+            Transaction.objects.create(user=self.user, amount=amount, type="I")
+        # the test database connection was opened before config.metrics connected its connection_created handler,
+        # async requests of the test client run their SQL on it (under ASGI every request opens its own connection)
+        install_on_open_connections()
+
+    def _metrics(self):
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 200, "/metrics should not need the json content-type")
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        return response.content.decode()
+
+    def test_records_route_status_queries_and_size(self):
+        response = self.client.get(reverse("all-transaction"), headers=self.headers)
+        self.client.get(reverse("all-transaction"), headers=self.headers)
+        self.client.get(reverse("transaction", args=[987654]), headers=self.headers)
+        text = self._metrics()
+
+        self.assertEqual(sample(text, 'qmp_requests_total{route="all-transaction",method="GET",status="200"}'), 2)
+        self.assertEqual(sample(text, 'qmp_requests_total{route="transaction",method="GET",status="404"}'), 1)
+        self.assertEqual(sample(text, 'qmp_request_duration_seconds_count{route="all-transaction",method="GET"}'), 2)
+        # token lookup (cached after the first request) + data version + page
+        self.assertEqual(sample(text, 'qmp_db_queries_sum{route="all-transaction",method="GET"}'), 2 + 3)
+        self.assertGreater(sample(text, 'qmp_db_duration_seconds_sum{route="all-transaction",method="GET"}'), 0)
+        self.assertEqual(sample(text, 'qmp_response_size_bytes_sum{route="all-transaction",method="GET"}'),
+                         2 * len(response.content))
+
+    def test_histogram_buckets_are_cumulative(self):
+        registry.observe_request("report", "GET", 200, duration=0.02, queries=3, db_time=0.001, size=50)
+        registry.observe_request("report", "GET", 200, duration=3, queries=3, db_time=0.001, size=50)
+        text = self._metrics()
+        self.assertEqual(sample(text, 'qmp_request_duration_seconds_bucket{route="report",method="GET",le="0.01"}'), 0)
+        self.assertEqual(sample(text, 'qmp_request_duration_seconds_bucket{route="report",method="GET",le="0.025"}'), 1)
+        self.assertEqual(sample(text, 'qmp_request_duration_seconds_bucket{route="report",method="GET",le="+Inf"}'), 2)
+        self.assertEqual(sample(text, 'qmp_db_queries_bucket{route="report",method="GET",le="3"}'), 2,
+                         "a value equal to the bound should be in its bucket")
+        self.assertIn("# TYPE qmp_request_duration_seconds histogram", text)
+
+    def test_unknown_url_is_unmatched(self):
+        self.client.get("/does-not-exist", headers=self.headers)
+        self.assertEqual(sample(self._metrics(), 'qmp_requests_total{route="unmatched",method="GET",status="404"}'), 1)
+
+    def test_processes_merged_with_metrics_dir(self):
+        with tempfile.TemporaryDirectory() as parent, override_settings(METRICS_DIR=f"{parent}/metrics"):
+            directory = f"{parent}/metrics"  # created by the first dump
+            other_process = MetricsRegistry()
+            other_process.observe_request("report", "GET", 200, duration=0.1, queries=2, db_time=0.01, size=10)
+            other_process.dump(directory, name="other")
+            registry.observe_request("report", "GET", 200, duration=0.1, queries=2, db_time=0.01, size=10)
+            text = self._metrics()
+        self.assertEqual(sample(text, 'qmp_requests_total{route="report",method="GET",status="200"}'), 2,
+                         "/metrics should sum the series of all processes")
+
+    async def test_async_request_db_queries_counted(self):
+        await self.async_client.get(reverse("all-transaction"), headers={"Authorization": self.headers["Authorization"]},
+                                    **{"content-type": "application/json"})
+        text = registry.render()
+        self.assertEqual(sample(text, 'qmp_requests_total{route="all-transaction",method="GET",status="200"}'), 1)
+        self.assertGreaterEqual(sample(text, 'qmp_db_queries_sum{route="all-transaction",method="GET"}'), 2)
@@ -0,0 +1,324 @@
+import datetime
+import importlib
+import random
+
+from django.apps import apps
+from django.db import IntegrityError, transaction as db_transaction
+from django.db.models import Sum, Q
+from django.db.models.functions import TruncMonth
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.admin import User
+
+from cash_managemnet.models import Transaction, Balance, MonthlySummary, DeletedTransaction
+
+
+def utc(*args):
+    return datetime.datetime(*args, tzinfo=datetime.timezone.utc)
+
+
+class TestBalanceIncrementalUpdate(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username="keyvan")
+
+    def _balance(self, user=None):
+        return Balance.objects.get(user=user or self.user).amnt
+
+    def test_insert_applies_signed_amount(self):
+        Transaction.objects.create(user=self.user, amount=500, type="I")
+        self.assertEqual(self._balance(), 500, "income should be added to the balance")
+        Transaction.objects.create(user=self.user, amount=200, type="E")
+        self.assertEqual(self._balance(), 300, "expense should be subtracted from the balance")
+
+    def test_one_balance_per_user(self):
+        Transaction.objects.create(user=self.user, amount=500, type="I")
+        with self.assertRaises(IntegrityError, msg="a second balance row of the user should be refused"):
+            with db_transaction.atomic():
+                Balance.objects.create(user=self.user, amnt=0)
+        self.assertEqual(self._balance(), 500)
+
+    def test_migration_recomputes_stored_balances(self):
+        migration = importlib.import_module("cash_managemnet.migrations.0017_recompute_balances")
+        other = User.objects.create(username="other")
+        Transaction.objects.create(user=self.user, amount=500, type="I")
+        Transaction.objects.create(user=self.user, amount=200, type="E")
+        Transaction.objects.create(user=other, amount=70, type="E")
+        # as stored by `incomes if incomes else 0 - expenses if expenses else 0`
+        Balance.objects.filter(user=self.user).update(amnt=500)
+        Balance.objects.filter(user=other).delete()
+        version = Balance.get_version(self.user.id)
+        migration.recompute_balances(apps, None)
+        self.assertEqual(self._balance(), 300, "the balance should be recomputed from the transactions")
+        self.assertEqual(self._balance(other), -70, "a missing balance row should be created")
+        self.assertEqual(Balance.get_version(self.user.id), version + 1, "a recomputed balance should get a new version")
+
+    def test_update_amount_and_type_flip(self):
+        Transaction.objects.create(user=self.user, amount=1000, type="I")
+        transaction = Transaction.objects.create(user=self.user, amount=200, type="E")
+
+        transaction.amount = 300
+        transaction.save()
+        self.assertEqual(self._balance(), 700, "amount change should apply the difference only")
+
+        transaction.type = "I"
+        transaction.save()
+        self.assertEqual(self._balance(), 1300, "type flip should apply twice the amount")
+
+    def test_update_stale_instance_uses_stored_values(self):
+        transaction = Transaction.objects.create(user=self.user, amount=200, type="I")
+        stale = Transaction.objects.get(id=transaction.id)
+        transaction.amount = 500
+        transaction.save()
+
+        stale.delete()
+        self.assertEqual(self._balance(), 0, "delete should subtract the stored amount, not the stale one")
+
+    def test_move_transaction_to_another_user(self):
+        another_user = User.objects.create(username="another user")
+        transaction = Transaction.objects.create(user=self.user, amount=200, type="I")
+        transaction.user = another_user
+        transaction.save()
+        self.assertEqual(self._balance(), 0)
+        self.assertEqual(self._balance(another_user), 200)
+
+    def test_delete_applies_negative_amount(self):
+        Transaction.objects.create(user=self.user, amount=100, type="I")
+        transaction = Transaction.objects.create(user=self.user, amount=40, type="E")
+        transaction.delete()
+        self.assertEqual(self._balance(), 100)
+
+    def test_incremental_matches_recompute(self):
+        for amount, type in [(100, "I"), (30, "E"), (70, "E"), (5, "I")]:
+            Transaction.objects.create(user=self.user, amount=amount, type=type)
+        balance = Balance.objects.get(user=self.user)
+        self.assertEqual(balance.amnt, 5)
+        self.assertEqual(balance.compute_balance_amount(), 5, "recompute should subtract expenses from incomes")
+        self.assertTrue(balance.verify_balance_amount())
+
+    @override_settings(BALANCE_VERIFY=True)
+    def test_verify_mode_repairs_drift(self):
+        Transaction.objects.create(user=self.user, amount=100, type="I")
+        Balance.objects.filter(user=self.user).update(amnt=12345)
+        with self.assertLogs("cash_managemnet.models", level="ERROR"):
+            Transaction.objects.create(user=self.user, amount=10, type="E")
+        self.assertEqual(self._balance(), 90, "verify mode should repair the drifted balance")
+
+
+
+class TestBalanceReconcile(TestCase):
+
+    def setUp(self):
+        self.users = [User.objects.create(username=f"user{index}") for index in range(4)]
+        # incomes and expenses, expenses only, incomes only, no transaction: the cases that
+        # `incomes if incomes else 0 - expenses if expenses else 0` got wrong (it returned the incomes only)
+        for user, incomes, expenses in [(self.users[0], [500, 100], [200]), (self.users[1], [], [70, 30]),
+                                        (self.users[2], [40], [])]:
+            for amount in incomes:
+                Transaction.objects.create(user=user, amount=amount, type="I")
+            for amount in expenses:
+                Transaction.objects.create(user=user, amount=amount, type="E")
+        self.range = (self.users[0].id, self.users[-1].id)
+
+    def test_grouped_recompute(self):
+        amounts = Balance.compute_balance_amounts(Transaction.objects.all())
+        self.assertEqual(amounts, {self.users[0].id: 400, self.users[1].id: -100, self.users[2].id: 40},
+                         "balance should be sum of incomes - sum of expenses")
+        self.assertEqual(Balance(user_id=self.users[3].id).compute_balance_amount(), 0)
+
+    def test_no_drift(self):
+        with self.assertNumQueries(2):
+            self.assertEqual(Balance.reconcile(*self.range), [])
+
+    def test_report_and_fix(self):
+        Balance.objects.filter(user=self.users[0]).update(amnt=500)  # the incomes only
+        Balance.objects.filter(user=self.users[1]).delete()
+        Balance.objects.create(user=self.users[3], amnt=10)
+        drifts = [(self.users[0].id, 500, 400), (self.users[1].id, None, -100), (self.users[3].id, 10, 0)]
+        self.assertEqual(Balance.reconcile(*self.range), drifts)
+        self.assertEqual(Balance.objects.get(user=self.users[0]).amnt, 500, "drifts should not be fixed by default")
+
+        version = Balance.get_version(self.users[0].id)
+        self.assertEqual(Balance.reconcile(*self.range, fix=True), drifts)
+        self.assertEqual(dict(Balance.objects.values_list("user_id", "amnt")),
+                         {self.users[0].id: 400, self.users[1].id: -100, self.users[2].id: 40, self.users[3].id: 0})
+        self.assertEqual(Balance.get_version(self.users[0].id), version + 1,
+                         "a repaired balance should invalidate the cached data of the user")
+        self.assertEqual(Balance.reconcile(*self.range), [])
+
+    def test_shard_range(self):
+        Balance.objects.filter(user=self.users[0]).update(amnt=0)
+        self.assertEqual(Balance.reconcile(self.users[1].id, self.users[3].id), [],
+                         "users out of the shard should not be checked")
+
+
+class TestChangeSequence(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username="keyvan")
+
+    def _version(self, user=None):
+        return Balance.objects.get(user=user or self.user).version
+
+    def test_writes_increase_seq(self):
+        first = Transaction.objects.create(user=self.user, amount=100, type="I")
+        second = Transaction.objects.create(user=self.user, amount=10, type="E")
+        self.assertLess(first.seq, second.seq)
+        self.assertEqual(second.seq, self._version(), "seq should be the data version of the write")
+
+        first.amount = 50
+        first.save(update_fields=["amount"])
+        first.refresh_from_db()
+        self.assertEqual(first.seq, self._version(), "an update should move the transaction to the new seq")
+
+    def test_bulk_insert_shares_seq(self):
+        created = Transaction.bulk_insert([Transaction(user=self.user, amount=index + 1, type="I") for index in range(3)])
+        self.assertEqual({transaction.seq for transaction in created}, {self._version()})
+        self.assertEqual(set(Transaction.objects.values_list("seq", flat=True)), {self._version()})
+
+    def test_delete_leaves_tombstone(self):
+        transaction = Transaction.objects.create(user=self.user, amount=100, type="I")
+        transaction_id = transaction.id
+        transaction.delete()
+        tombstone = DeletedTransaction.objects.get()
+        self.assertEqual((tombstone.user_id, tombstone.transaction_id, tombstone.seq),
+                         (self.user.id, transaction_id, self._version()))
+
+    def test_move_to_another_user_leaves_tombstone(self):
+        other = User.objects.create(username="other")
+        transaction = Transaction.objects.create(user=self.user, amount=100, type="I")
+        transaction.user = other
+        transaction.save()
+        self.assertTrue(DeletedTransaction.objects.filter(user=self.user, transaction_id=transaction.id,
+                                                          seq=self._version()).exists(),
+                        "the previous owner should see the transaction as deleted")
+        self.assertEqual(transaction.seq, self._version(other))
+
+
+class TestMonthlySummary(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username="keyvan")
+
+    def _summaries(self):
+        return {
+            summary.month: (summary.income_total, summary.expense_total, summary.income_count, summary.expense_count)
+            for summary in MonthlySummary.objects.filter(user=self.user)
+        }
+
+    def _group_by_report(self, **filter_lookups):
+        # the report as it was computed before the monthly summaries
+        return list(Transaction.objects.filter(user=self.user, **filter_lookups).annotate(
+            month=TruncMonth("date")).values("month").annotate(
+            expenses=Sum("amount", filter=Q(type=Transaction.TypeChoices.EXPENSE)),
+            incomes=Sum("amount", filter=Q(type=Transaction.TypeChoices.INCOME)),
+        ).values("month", "expenses", "incomes").order_by("month"))
+
+    def test_save_update_delete_maintain_summary(self):
+        transaction = Transaction.objects.create(user=self.user, amount=100, type="I", date=utc(2023, 1, 10))
+        Transaction.objects.create(user=self.user, amount=30, type="E", date=utc(2023, 1, 20))
+        self.assertEqual(self._summaries(), {utc(2023, 1, 1): (100, 30, 1, 1)})
+
+        transaction.date = utc(2023, 2, 5)
+        transaction.type = "E"
+        transaction.save()
+        self.assertEqual(self._summaries(), {utc(2023, 1, 1): (0, 30, 0, 1), utc(2023, 2, 1): (0, 100, 0, 1)},
+                         "moving a transaction to another month should update both months")
+
+        transaction.delete()
+        self.assertEqual(self._summaries(), {utc(2023, 1, 1): (0, 30, 0, 1)}, "empty months should be removed")
+
+    def test_bulk_insert_maintains_summary(self):
+        Transaction.bulk_insert([
+            Transaction(user=self.user, amount=10, type="I", date=utc(2023, 1, 1)),
+            Transaction(user=self.user, amount=20, type="I", date=utc(2023, 1, 31, 23, 59)),
+            Transaction(user=self.user, amount=5, type="E", date=utc(2023, 3, 1)),
+        ])
+        self.assertEqual(self._summaries(), {utc(2023, 1, 1): (30, 0, 2, 0), utc(2023, 3, 1): (0, 5, 0, 1)})
+
+    def test_rebuild_matches_maintained_summary(self):
+        for index in range(30):
+            Transaction.objects.create(user=self.user, amount=index, type="IE"[index % 2],
+                                       date=utc(2022, 1 + index % 12, 1 + index % 28))
+        maintained = self._summaries()
+        MonthlySummary.objects.filter(user=self.user).update(income_total=0)
+        self.assertEqual(MonthlySummary.rebuild([self.user.id]), 12)
+        self.assertEqual(self._summaries(), maintained)
+
+    def test_report_matches_group_by(self):
+        rnd = random.Random(1)
+        Transaction.bulk_insert([
+            Transaction(user=self.user, amount=rnd.randint(1, 1000), type=rnd.choice("IE"),
+                        date=utc(2022, 1, 1) + datetime.timedelta(hours=rnd.randint(0, 24 * 400)))
+            for _ in range(300)
+        ])
+        Transaction.objects.create(user=self.user, amount=7, type="I", date=utc(2024, 6, 6))  # a month without expenses
+        ranges = [
+            {},
+            {"date__gt": utc(2022, 3, 15, 12)},
+            {"date__lt": utc(2022, 11, 2)},
+            {"date__gt": utc(2022, 2, 1), "date__lt": utc(2022, 5, 1)},
+            {"date__gt": utc(2022, 6, 3), "date__lt": utc(2022, 6, 20)},
+            {"date__gt": utc(2022, 12, 31, 23, 59), "date__lt": utc(2024, 12, 1)},
+        ]
+        for filter_lookups in ranges:
+            self.assertEqual(MonthlySummary.report(self.user.id, **filter_lookups), self._group_by_report(**filter_lookups),
+                             f"report from summaries should match the group by for {filter_lookups}")
+
+
+class TestBalanceAsOf(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username="keyvan")
+
+    def _openings(self):
+        return dict(MonthlySummary.objects.filter(user=self.user).values_list("month", "opening_balance"))
+
+    def _sum_until(self, date):
+        # the balance as of date as it is computed without the snapshots
+        return Balance.compute_balance_amounts(Transaction.objects.filter(user=self.user, date__lte=date)).get(
+            self.user.id, 0)
+
+    def test_back_dated_writes_update_later_snapshots(self):
+        Transaction.objects.create(user=self.user, amount=100, type="I", date=utc(2023, 1, 10))
+        transaction = Transaction.objects.create(user=self.user, amount=30, type="E", date=utc(2023, 3, 5))
+        self.assertEqual(self._openings(), {utc(2023, 1, 1): 0, utc(2023, 3, 1): 100})
+
+        Transaction.objects.create(user=self.user, amount=500, type="I", date=utc(2022, 12, 31))
+        self.assertEqual(self._openings(), {utc(2022, 12, 1): 0, utc(2023, 1, 1): 500, utc(2023, 3, 1): 600},
+                         "a back-dated transaction should be added to the later snapshots")
+
+        Transaction.objects.create(user=self.user, amount=50, type="E", date=utc(2023, 2, 1))
+        self.assertEqual(self._openings()[utc(2023, 2, 1)], 600, "a new month should open with the previous balance")
+        self.assertEqual(self._openings()[utc(2023, 3, 1)], 550)
+
+        transaction.date = utc(2022, 11, 1)
+        transaction.save()
+        self.assertEqual(self._openings(), {utc(2022, 11, 1): 0, utc(2022, 12, 1): -30, utc(2023, 1, 1): 470,
+                                            utc(2023, 2, 1): 570})
+        transaction.delete()
+        self.assertEqual(self._openings(), {utc(2022, 12, 1): 0, utc(2023, 1, 1): 500, utc(2023, 2, 1): 600})
+
+    def test_as_of_matches_sum(self):
+        rnd = random.Random(2)
+        Transaction.bulk_insert([
+            Transaction(user=self.user, amount=rnd.randint(1, 1000), type=rnd.choice("IE"),
+                        date=utc(2022, 1, 1) + datetime.timedelta(hours=rnd.randint(0, 24 * 400)))
+            for _ in range(200)
+        ])
+        for transaction in Transaction.objects.filter(user=self.user).order_by("id")[:20]:
+            transaction.date = utc(2021, 6, 1) + datetime.timedelta(hours=rnd.randint(0, 24 * 900))
+            transaction.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(MonthlySummary.balance_as_of(self.user.id, utc(2021, 1, 1)), 0,
+                             "the balance before the first transaction should be 0")
+        dates = [utc(2022, 1, 1), utc(2022, 5, 31, 23, 59), utc(2023, 1, 15, 12), utc(2025, 1, 1)]
+        dates += list(Transaction.objects.filter(user=self.user).values_list("date", flat=True)[:10])
+        for date in dates:
+            with self.assertNumQueries(2):  # snapshot and transactions of one month
+                amnt = MonthlySummary.balance_as_of(self.user.id, date)
+            self.assertEqual(amnt, self._sum_until(date), f"balance as of {date} should match the sum")
+
+        maintained = self._openings()
+        MonthlySummary.objects.filter(user=self.user).update(opening_balance=0)
+        MonthlySummary.rebuild([self.user.id])
+        self.assertEqual(self._openings(), maintained, "rebuilt snapshots should match the maintained ones")
@@ -0,0 +1,85 @@
+import os
+import pstats
+import tempfile
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.admin import User
+from rest_framework.authtoken.models import Token
+
+from cash_managemnet.models import Transaction
+from config.metrics import install_on_open_connections
+from tests import SHARED_CACHES
+
+
+@override_settings(CACHES=SHARED_CACHES)
+class TestProfileRequest(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.settings_override = override_settings(PROFILE_DIR=self.directory.name)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        self.user = User.objects.create_user(username="keyvan", password="123456")
+        Transaction.objects.create(user=self.user, amount=100, type="I")
+        # the test database connection was opened before config.metrics connected its connection_created handler,
+        # async requests of the test client run their SQL on it (under ASGI every request opens its own connection)
+        install_on_open_connections()
+
+    def _get(self, user, profile="1"):
+        headers = {"Authorization": f"Token {Token.objects.get_or_create(user=user)[0].key}",
+                   "Content-Type": "application/json", "X-Profile": profile}
+        return self.client.get(reverse("all-transaction"), headers=headers)
+
+    def test_staff_request_profiled(self):
+        self.user.is_staff = True
+        self.user.save()
+        response = self._get(self.user, profile="tottime")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 1, "the response should not change")
+        profile_id = response["X-Profile-Id"]
+        self.assertIn("all-transaction", profile_id)
+        self.assertGreater(int(response["X-Profile-Queries"]), 0)
+
+        path = os.path.join(self.directory.name, profile_id)
+        self.assertTrue(os.path.exists(path + ".prof"))
+        with open(path + ".txt") as file:
+            report = file.read()
+        self.assertIn("Ordered by: internal time", report)
+        functions = [function for _, _, function in pstats.Stats(path + ".prof").stats]
+        self.assertIn("filter_queryset", functions, "the view code should be in the profile")
+        self.assertIn('FROM "cash_managemnet_transaction"', report, "the SQL statements should be listed")
+
+    def test_profiles_of_same_second_not_overwritten(self):
+        self.user.is_staff = True
+        self.user.save()
+        profile_ids = {self._get(self.user)["X-Profile-Id"] for _ in range(3)}
+        self.assertEqual(len(profile_ids), 3, "every profile should have its own id")
+        self.assertEqual(len(os.listdir(self.directory.name)), 6)
+
+    def test_not_staff_request_not_profiled(self):
+        response = self._get(self.user)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("X-Profile-Id", response)
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+    def test_bad_token_not_profiled(self):
+        response = self.client.get(reverse("all-transaction"), headers={
+            "Authorization": "Token blabla", "Content-Type": "application/json", "X-Profile": "1"})
+        self.assertEqual(response.status_code, 401)
+        self.assertNotIn("X-Profile-Id", response)
+
+    def test_profiling_enabled_setting(self):
+        with override_settings(PROFILING_ENABLED=True):
+            response = self._get(self.user)
+        self.assertIn("X-Profile-Id", response, "with PROFILING_ENABLED any request can be profiled")
+
+    async def test_async_request_profiled(self):
+        self.user.is_staff = True
+        await self.user.asave()
+        token, _ = await Token.objects.aget_or_create(user=self.user)
+        response = await self.async_client.get(reverse("all-transaction"), headers={
+            "Authorization": f"Token {token.key}", "X-Profile": "1"}, **{"content-type": "application/json"})
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(int(response["X-Profile-Queries"]), 0, "SQL of the sync_to_async threads is recorded")
@@ -0,0 +1,64 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.admin import User
+from rest_framework.authtoken.models import Token
+
+from cash_managemnet.models import Transaction
+from config import slow_queries
+from config.metrics import install_on_open_connections
+
+
+class TestSlowQueryLog(TestCase):
+
+    def setUp(self):
+        install_on_open_connections()
+        slow_queries.rate_limiter = slow_queries.RateLimiter()
+        self.user = User.objects.create_user(username="keyvan", password="123456")
+        self.headers = {"Authorization": f"Token {Token.objects.create(user=self.user).key}",
+                        "Content-Type": "application/json"}
+        Transaction.objects.create(user=self.user, amount=100, type="I")
+        # every statement is slow from here
+        slow = override_settings(SLOW_QUERY_THRESHOLD=0, SLOW_QUERY_SAMPLE_RATE=1, SLOW_QUERY_MAX_PER_MINUTE=1000)
+        slow.enable()
+        self.addCleanup(slow.disable)
+
+    def test_slow_statement_logged_with_view_user_and_plan(self):
+        with self.assertLogs("config.slow_queries", level="WARNING") as logs:
+            self.client.get(reverse("all-transaction"), {"order_by": "amount"}, headers=self.headers)
+        records = [record for record in logs.records
+                   if record.view == "all-transaction" and 'FROM "cash_managemnet_transaction"' in record.sql]
+        self.assertEqual(len(records), 1, "the page query should be logged once (not its EXPLAIN)")
+        self.assertEqual(records[0].user_id, self.user.id)
+        self.assertIn("cm_tx_user_amount_idx", records[0].plan, "the plan should show the index used")
+
+    def test_params_not_logged(self):
+        key = Token.objects.get(user=self.user).key
+        with self.assertLogs("config.slow_queries", level="WARNING") as logs:
+            self.client.get(reverse("all-transaction"), headers=self.headers)
+        self.assertTrue(any('FROM "authtoken_token"' in record.sql for record in logs.records),
+                        "the token lookup should be logged")
+        for record in logs.records:
+            self.assertNotIn(key, record.getMessage(), "the token should not be logged")
+
+    def test_no_plan_for_writes_and_no_request(self):
+        with self.assertLogs("config.slow_queries", level="WARNING") as logs:
+            Transaction.objects.filter(user=self.user).update(amount=5)
+        self.assertIsNone(logs.records[0].plan)
+        self.assertIsNone(logs.records[0].view, "statements outside a request have no view")
+
+    @override_settings(SLOW_QUERY_SAMPLE_RATE=0)
+    def test_sampling(self):
+        with self.assertNoLogs("config.slow_queries", level="WARNING"):
+            self.client.get(reverse("all-transaction"), headers=self.headers)
+
+    @override_settings(SLOW_QUERY_THRESHOLD=10)
+    def test_fast_statements_not_logged(self):
+        with self.assertNoLogs("config.slow_queries", level="WARNING"):
+            self.client.get(reverse("all-transaction"), headers=self.headers)
+
+    def test_rate_limit(self):
+        limiter = slow_queries.RateLimiter()
+        self.assertEqual([limiter.allow(2) for _ in range(3)], [True, True, False])
+        limiter.updated -= 30  # half a minute later
+        self.assertTrue(limiter.allow(2))
+        self.assertFalse(limiter.allow(2))
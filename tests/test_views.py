@@ -1,13 +1,19 @@
 import datetime
 import json
+from unittest import mock
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework.authtoken.admin import User
 from rest_framework.authtoken.models import Token
 
-from cash_managemnet.models import Transaction
+from cash_managemnet.models import Transaction, Balance, Category
+from cash_managemnet.views import GetAllTransactionView
+from tests import SHARED_CACHES
 
 
 def test_default_auth_model(self):
@@ -363,8 +369,504 @@ class TestGetAllTransactionView(TestCase):
         response = self._request(reverse("all-transaction"), {}, self.token, "GET")
         self.assertEqual(len(response.data), 2)
 
+    def test_get_all_transactions_date_filters(self):
+        user = User.objects.get(username=self.username)
+        old = Transaction.objects.create(user=user, amount=200, type="I", date="2020-01-01T00:00:00Z")
+        new = Transaction.objects.create(user=user, amount=500, type="E", date="2022-01-01T00:00:00Z")
 
+        response = self._request(reverse("all-transaction"), {"date__gt": "2021-01-01T00:00:00Z"}, self.token, "GET")
+        self.assertEqual([row["id"] for row in response.data], [new.id], "date__gt should filter the transactions")
+        response = self._request(reverse("all-transaction"), {"date__lt": "2021-01-01T00:00:00Z"}, self.token, "GET")
+        self.assertEqual([row["id"] for row in response.data], [old.id], "date__lt should filter the transactions")
 
 
 
 
+
+
+
+
+class TestBulkCreateTransactionView(TestCase):
+    username = "keyvan"
+    password = "123456"
+
+    def setUp(self):
+        self.user = User.objects.create_user(username=self.username, password=self.password)
+        self.token = Token.objects.create(user=self.user).key
+
+    def _request(self, data):
+        return self.client.post(reverse("bulk-insert-transaction"), data, content_type="application/json",
+                                headers={"Authorization": f"Token {self.token}"})
+
+    def test_bulk_insert_not_login(self):
+        self.token = "blabla"
+        response = self._request([{"amount": 200, "type": "I"}])
+        self.assertEqual(response.status_code, 401, "should return response with 401 status code")
+
+    def test_bulk_insert_successful(self):
+        data = [{"amount": 200, "type": "I"}, {"amount": 50, "type": "E", "date": "2020-02-02T18:30:00Z"}]
+        response = self._request(data)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data), 2)
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 2)
+        self.assertTrue(all(item["id"] for item in response.data), "created ids should be returned")
+        self.assertEqual(Balance.objects.get(user=self.user).amnt, 150, "balance should be adjusted for the batch")
+
+    def test_bulk_insert_invalid_item_saves_nothing(self):
+        response = self._request([{"amount": 200, "type": "I"}, {"amount": 50, "type": "BadEI"}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Transaction.objects.count(), 0, "nothing should be saved on a bad item")
+
+    def test_bulk_insert_not_a_list(self):
+        response = self._request({"amount": 200, "type": "I"})
+        self.assertEqual(response.status_code, 400)
+        response = self._request([])
+        self.assertEqual(response.status_code, 400, "empty list should not be accepted")
+
+
+class TestGetAllTransactionPagination(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="keyvan", password="123456")
+        self.token = Token.objects.create(user=self.user).key
+
+    def _get(self, url, data=None):
+        return self.client.get(url, data or {},
+                               headers={"Authorization": f"Token {self.token}", "Content-Type": "application/json"})
+
+    def _get_all_pages(self, data):
+        ids, url = [], reverse("all-transaction")
+        while url:
+            response = self._get(url, data)
+            self.assertEqual(response.status_code, 200)
+            ids += [item["id"] for item in response.data]
+            url, data = response.headers.get("Link", "")[1:].split(">")[0] or None, None
+        return ids
+
+    def test_pages_follow_order_by_and_id(self):
+        for amount in [300, 100, 200, 100, 300, 100]:
+            Transaction.objects.create(user=self.user, amount=amount, type="I")
+        ids = self._get_all_pages({"order_by": "amount", "page_size": 2})
+        expected = list(Transaction.objects.order_by("amount", "id").values_list("id", flat=True))
+        self.assertEqual(ids, expected, "pages should be ordered by (amount, id) without gaps and duplicates")
+
+    def test_pages_with_null_values_and_filters(self):
+        category = Category.objects.create(name="rent")
+        for index in range(5):
+            Transaction.objects.create(user=self.user, amount=10, type="E", category=category if index % 2 else None)
+        Transaction.objects.create(user=self.user, amount=10, type="I")
+        ids = self._get_all_pages({"order_by": "category", "type": "E", "page_size": 2})
+        self.assertEqual(len(ids), 5)
+        self.assertEqual(len(set(ids)), 5, "rows should not be duplicated across pages")
+
+    def test_insert_during_paging_is_stable(self):
+        for _ in range(4):
+            Transaction.objects.create(user=self.user, amount=10, type="I")
+        response = self._get(reverse("all-transaction"), {"page_size": 2})
+        first_page = [item["id"] for item in response.data]
+        next_url = response.headers["Link"][1:].split(">")[0]
+
+        Transaction.objects.create(user=self.user, amount=10, type="I",
+                                   date=datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc))
+        response = self._get(next_url)
+        second_page = [item["id"] for item in response.data]
+        self.assertFalse(set(first_page) & set(second_page), "next page should not repeat rows")
+        self.assertEqual(len(second_page), 2)
+
+    def test_page_size_limit_and_bad_cursor(self):
+        for _ in range(3):
+            Transaction.objects.create(user=self.user, amount=10, type="I")
+        response = self._get(reverse("all-transaction"), {"page_size": 100000})
+        self.assertEqual(len(response.data), 3)
+        self.assertNotIn("Link", response.headers, "last page should not have a next link")
+        response = self._get(reverse("all-transaction"), {"cursor": "blabla"})
+        self.assertEqual(response.status_code, 404, "bad cursor should return 404")
+
+
+class TestFastSerialization(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="keyvan", password="123456")
+        self.headers = {"Authorization": f"Token {Token.objects.create(user=self.user).key}",
+                        "Content-Type": "application/json"}
+        category = Category.objects.create(name="rent")
+        for index in range(7):
+            Transaction.objects.create(user=self.user, amount=100 * (index % 3), type="IE"[index % 2],
+                                       category=category if index % 2 else None,
+                                       date=datetime.datetime(2023, 1 + index, 10, 8, 30, 5, index * 1000 if index % 3 else 0,
+                                                              tzinfo=datetime.timezone.utc))
+
+    def _get(self, data):
+        return self.client.get(reverse("all-transaction"), data, headers=self.headers)
+
+    def _assert_same_response(self, data):
+        fast_response = self._get(data)
+        with mock.patch.object(GetAllTransactionView, "fast_serialization", False):
+            serializer_response = self._get(data)
+        self.assertEqual(fast_response.status_code, 200)
+        self.assertEqual(fast_response.content, serializer_response.content,
+                         f"the fast path should render the same bytes for {data}")
+        self.assertEqual(fast_response.get("Link"), serializer_response.get("Link"))
+        return fast_response
+
+    def test_same_bytes_as_serializer(self):
+        for data in [{}, {"type": "E"}, {"order_by": "date", "page_size": 3}, {"order_by": "category", "page_size": 2},
+                     {"order_by": "user", "page_size": 2}, {"order_by": "amount", "amount__gt": 50}]:
+            self._assert_same_response(data)
+
+    def test_same_bytes_in_another_timezone(self):
+        with override_settings(TIME_ZONE="Asia/Tehran"):
+            response = self._assert_same_response({})
+        self.assertIn(b"+03:30", response.content)
+
+    def test_no_model_instances(self):
+        with mock.patch.object(Transaction, "__init__", side_effect=AssertionError("model instance created")):
+            response = self._get({})
+        self.assertEqual(response.status_code, 200)
+
+
+class TestSparseFields(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="keyvan", password="123456")
+        self.headers = {"Authorization": f"Token {Token.objects.create(user=self.user).key}",
+                        "Content-Type": "application/json"}
+        category = Category.objects.create(name="rent")
+        for index in range(5):
+            Transaction.objects.create(user=self.user, amount=100 * index, type="IE"[index % 2],
+                                       category=category if index % 2 else None,
+                                       date=datetime.datetime(2023, 1 + index, 10, 8, 30, 5, tzinfo=datetime.timezone.utc))
+        self.transaction = Transaction.objects.filter(user=self.user).first()
+
+    def _get(self, url, data):
+        return self.client.get(url, data, headers=self.headers)
+
+    def test_detail_fields(self):
+        response = self._get(reverse("transaction", args=[self.transaction.id]), {"fields": "date,amount"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.json()), ["amount", "date"], "fields should follow the serializer order")
+        full = self._get(reverse("transaction", args=[self.transaction.id]), {}).json()
+        self.assertEqual(response.json(), {"amount": full["amount"], "date": full["date"]})
+
+    def test_list_fields_same_as_serializer(self):
+        for data in [{"fields": "id,amount"}, {"fields": "date"}, {"fields": "category,type", "order_by": "date"},
+                     {"fields": "amount", "order_by": "category", "page_size": 2}, {"fields": ""}]:
+            response = self._get(reverse("all-transaction"), data)
+            with mock.patch.object(GetAllTransactionView, "fast_serialization", False):
+                serializer_response = self._get(reverse("all-transaction"), data)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.content, serializer_response.content,
+                             f"the fast path should render the same bytes for {data}")
+            self.assertEqual(response.get("Link"), serializer_response.get("Link"))
+            names = data["fields"].split(",") if data["fields"] else ["id", "amount", "type", "category", "date"]
+            self.assertEqual(set(response.json()[0]), set(names))
+
+    def test_pages_without_id_field(self):
+        data = {"fields": "amount", "order_by": "date", "page_size": 2}
+        amounts = []
+        response = self._get(reverse("all-transaction"), data)
+        while True:
+            amounts += [row["amount"] for row in response.json()]
+            if "Link" not in response:
+                break
+            response = self.client.get(response["Link"][1:].split(">")[0], headers=self.headers)
+        self.assertEqual(amounts, [0, 100, 200, 300, 400], "the cursor should work without the id field")
+
+    def test_only_selected_columns(self):
+        for url, fast_serialization in [(reverse("all-transaction"), True), (reverse("all-transaction"), False),
+                                        (reverse("transaction", args=[self.transaction.id]), True)]:
+            with mock.patch.object(GetAllTransactionView, "fast_serialization", fast_serialization), \
+                    CaptureQueriesContext(connection) as queries:
+                self._get(url, {"fields": "amount"})
+            sql = [query["sql"] for query in queries if 'FROM "cash_managemnet_transaction"' in query["sql"]]
+            self.assertEqual(len(sql), 1)
+            self.assertNotIn('"cash_managemnet_transaction"."date"', sql[0], "unrequested columns should not be read")
+
+    def test_unknown_field(self):
+        for url in [reverse("all-transaction"), reverse("transaction", args=[self.transaction.id])]:
+            response = self._get(url, {"fields": "amount,user"})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("fields", response.json())
+
+
+class TestSyncTransactionView(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="keyvan", password="123456")
+        self.headers = {"Authorization": f"Token {Token.objects.create(user=self.user).key}",
+                        "Content-Type": "application/json"}
+        Transaction.bulk_insert([Transaction(user=self.user, amount=index + 1, type="IE"[index % 2])
+                                 for index in range(25)])
+        Transaction.objects.create(user=User.objects.create(username="other"), amount=1, type="I")
+
+    def _sync(self, cursor=None, **data):
+        if cursor:
+            data["cursor"] = cursor
+        response = self.client.get(reverse("sync-transaction"), data, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def _sync_all(self, cursor=None, **data):
+        # (changed ids, deleted ids, cursor, number of requests) following has_more
+        changes, deleted, requests = [], [], 0
+        while True:
+            body = self._sync(cursor, **data)
+            changes += [row["id"] for row in body["changes"]]
+            deleted += body["deleted"]
+            cursor, requests = body["cursor"], requests + 1
+            if not body["has_more"]:
+                return changes, deleted, cursor, requests
+
+    def test_first_sync_in_batches(self):
+        changes, deleted, _, requests = self._sync_all(page_size=10)
+        ids = list(Transaction.objects.filter(user=self.user).order_by("id").values_list("id", flat=True))
+        self.assertEqual(changes, ids, "the first sync should return every transaction of the user once")
+        self.assertEqual((deleted, requests), ([], 3), "a bulk insert larger than page_size should be split")
+
+    def test_only_changes_after_cursor(self):
+        _, _, cursor, _ = self._sync_all()
+        transactions = list(Transaction.objects.filter(user=self.user).order_by("id")[:3])
+        transactions[0].amount = 999
+        transactions[0].save()
+        deleted_id = transactions[1].id
+        transactions[1].delete()
+        new = Transaction.objects.create(user=self.user, amount=5, type="E")
+
+        body = self._sync(cursor)
+        self.assertEqual([(row["id"], row["amount"]) for row in body["changes"]],
+                         [(transactions[0].id, 999), (new.id, 5)], "only the updated and created rows should be sent")
+        self.assertEqual(list(body["changes"][0]), ["id", "amount", "type", "category", "date"])
+        self.assertEqual(body["deleted"], [deleted_id])
+        self.assertFalse(body["has_more"])
+
+        nothing = self._sync(body["cursor"])
+        self.assertEqual((nothing["changes"], nothing["deleted"], nothing["cursor"]), ([], [], body["cursor"]),
+                         "without changes the cursor should stay the same")
+
+    def test_changes_and_deletes_in_sequence_order(self):
+        _, _, cursor, _ = self._sync_all()
+        created = []
+        for index in range(4):
+            created.append(Transaction.objects.create(user=self.user, amount=index + 1, type="I"))
+            Transaction.objects.filter(user=self.user, amount=index + 1).exclude(id=created[-1].id).first().delete()
+        changes, deleted, _, requests = self._sync_all(cursor, page_size=3)
+        self.assertEqual(changes, [transaction.id for transaction in created])
+        self.assertEqual(len(deleted), 4)
+        self.assertEqual(requests, 3)
+
+    def test_not_modified_and_invalid_cursor(self):
+        response = self.client.get(reverse("sync-transaction"), headers=self.headers)
+        response = self.client.get(reverse("sync-transaction"), headers={**self.headers,
+                                                                         "If-None-Match": response["ETag"]})
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(reverse("sync-transaction"), {"cursor": "bad"}, headers=self.headers)
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(CACHES=SHARED_CACHES)
+class TestGenerateReportMonthly(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="keyvan", password="123456")
+        self.token = Token.objects.create(user=self.user).key
+
+    def _get(self, data=None):
+        return self.client.get(reverse("report"), data or {},
+                               headers={"Authorization": f"Token {self.token}", "Content-Type": "application/json"})
+
+    def test_report_successful(self):
+        Transaction.objects.create(user=self.user, amount=500, type="I", date="2023-08-10T10:00:00Z")
+        Transaction.objects.create(user=self.user, amount=100, type="E", date="2023-08-11T10:00:00Z")
+        Transaction.objects.create(user=self.user, amount=200, type="E", date="2023-10-11T10:00:00Z")
+        response = self._get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), [
+            {"month": "2023-08-01T00:00:00Z", "expenses": 100, "incomes": 500},
+            {"month": "2023-10-01T00:00:00Z", "expenses": 200, "incomes": None},
+        ])
+
+    def test_report_date_filters(self):
+        Transaction.objects.create(user=self.user, amount=500, type="I", date="2023-08-10T10:00:00Z")
+        Transaction.objects.create(user=self.user, amount=100, type="I", date="2023-08-20T10:00:00Z")
+        response = self._get({"date__gt": "2023-08-15T00:00:00Z"})
+        self.assertEqual(json.loads(response.content), [
+            {"month": "2023-08-01T00:00:00Z", "expenses": None, "incomes": 100},
+        ])
+
+    def test_report_bad_date(self):
+        response = self._get({"date__lt": "blabla"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_report_is_cached_until_next_write(self):
+        Transaction.objects.create(user=self.user, amount=500, type="I", date="2023-08-10T10:00:00Z")
+        first = json.loads(self._get().content)
+        with self.assertNumQueries(1):  # data version (the token is cached), no report query
+            self.assertEqual(json.loads(self._get().content), first)
+
+        Transaction.objects.create(user=self.user, amount=100, type="I", date="2023-08-10T10:00:00Z")
+        self.assertEqual(json.loads(self._get().content)[0]["incomes"], 600, "a write should invalidate the cache")
+
+    def test_report_cache_is_per_user_and_filter(self):
+        another_user = User.objects.create_user(username="another user", password="123456")
+        Transaction.objects.create(user=another_user, amount=10, type="I", date="2023-08-10T10:00:00Z")
+        Transaction.objects.create(user=self.user, amount=500, type="I", date="2023-08-10T10:00:00Z")
+        self.assertEqual(json.loads(self._get().content)[0]["incomes"], 500)
+        self.assertEqual(self._get({"date__gt": "2023-09-01T00:00:00Z"}).data, [])
+
+
+@override_settings(CACHES=SHARED_CACHES)
+class TestBalanceView(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="keyvan", password="123456")
+        self.headers = {"Authorization": f"Token {Token.objects.create(user=self.user).key}", "Content-Type": "application/json"}
+        Transaction.objects.create(user=self.user, amount=200, type="I")
+        Transaction.objects.create(user=self.user, amount=50, type="E")
+
+    def test_balance_with_one_query(self):
+        self.client.get(reverse("balance"), headers=self.headers)  # caches the token
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("balance"), headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"amnt": 150, "version": 2})
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("balance"), headers={**self.headers, "If-None-Match": response["ETag"]})
+        self.assertEqual(response.status_code, 304)
+
+    def test_user_without_transaction(self):
+        user = User.objects.create_user(username="ali", password="123456")
+        response = self.client.get(reverse("balance"),
+                                   headers={"Authorization": f"Token {Token.objects.create(user=user).key}",
+                                            "Content-Type": "application/json"})
+        self.assertEqual(response.json(), {"amnt": 0, "version": 0})
+
+    def _make_staff(self):
+        # the authenticated user is cached with the token
+        User.objects.filter(id=self.user.id).update(is_staff=True)
+        cache.clear()
+
+    def test_verify_admin_only(self):
+        response = self.client.get(reverse("balance"), {"verify": 1}, headers=self.headers)
+        self.assertEqual(response.status_code, 403, "verify should be refused to non admin users")
+
+        self._make_staff()
+        response = self.client.get(reverse("balance"), {"verify": 1}, headers=self.headers)
+        self.assertEqual(response.json()["verify"], {"expected": 150, "ok": True})
+        self.assertNotIn("ETag", response, "verify should not be answered from a cached version")
+
+    def test_verify_reports_drift_without_repair(self):
+        self._make_staff()
+        Balance.objects.filter(user=self.user).update(amnt=999)
+        response = self.client.get(reverse("balance"), {"verify": 1}, headers=self.headers)
+        self.assertEqual(response.json(), {"amnt": 999, "version": 2, "verify": {"expected": 150, "ok": False}})
+        self.assertEqual(Balance.objects.get(user=self.user).amnt, 999, "verify should not repair the balance")
+
+    def test_not_authenticated(self):
+        response = self.client.get(reverse("balance"), headers={"Content-Type": "application/json"})
+        self.assertEqual(response.status_code, 401)
+
+
+class TestBalanceAsOfView(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="keyvan", password="123456")
+        self.headers = {"Authorization": f"Token {Token.objects.create(user=self.user).key}",
+                        "Content-Type": "application/json"}
+        Transaction.objects.create(user=self.user, amount=200, type="I", date="2023-01-10T10:00:00Z")
+        Transaction.objects.create(user=self.user, amount=50, type="E", date="2023-03-10T10:00:00Z")
+
+    def _get(self, **params):
+        return self.client.get(reverse("balance-as-of"), params, headers=self.headers)
+
+    def test_balance_as_of(self):
+        self.assertEqual(self._get(date="2022-12-31T00:00:00Z").json(), {"date": "2022-12-31T00:00:00Z", "amnt": 0})
+        self.assertEqual(self._get(date="2023-03-10T10:00:00Z").json()["amnt"], 150,
+                         "transactions at the date should be included")
+        self.assertEqual(self._get(date="2023-03-10T09:59:59Z").json()["amnt"], 200)
+
+    def test_invalid_date(self):
+        for params in [{}, {"date": "blabla"}]:
+            response = self._get(**params)
+            self.assertEqual(response.status_code, 400, f"{params} should be refused")
+            self.assertIn("date", response.json())
+
+
+@override_settings(CACHES=SHARED_CACHES)
+class TestConditionalGet(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="keyvan", password="123456")
+        self.token = Token.objects.create(user=self.user).key
+        self.transaction = Transaction.objects.create(user=self.user, amount=200, type="I")
+
+    def _get(self, url, etag=None):
+        headers = {"Authorization": f"Token {self.token}", "Content-Type": "application/json"}
+        if etag:
+            headers["If-None-Match"] = etag
+        return self.client.get(url, headers=headers)
+
+    def test_not_modified_without_transaction_query(self):
+        for url in [reverse("all-transaction"), reverse("transaction", args=[self.transaction.id]), reverse("report")]:
+            response = self._get(url)
+            self.assertEqual(response.status_code, 200)
+            etag = response.headers["ETag"]
+            with self.assertNumQueries(1):  # data version (the token is cached)
+                response = self._get(url, etag)
+            self.assertEqual(response.status_code, 304, f"{url} should not be modified")
+            self.assertEqual(response.content, b"")
+
+    def test_write_changes_etag(self):
+        url = reverse("all-transaction")
+        etag = self._get(url).headers["ETag"]
+        Transaction.objects.create(user=self.user, amount=10, type="E")
+        response = self._get(url, etag)
+        self.assertEqual(response.status_code, 200, "a write should change the ETag")
+        self.assertEqual(len(response.data), 2)
+        self.assertNotEqual(response.headers["ETag"], etag)
+
+    def test_etag_depends_on_query_params(self):
+        etag = self._get(reverse("all-transaction")).headers["ETag"]
+        response = self._get(reverse("all-transaction") + "?type=E", etag)
+        self.assertEqual(response.status_code, 200, "another filter is another representation")
+
+
+class TestExportTransactionView(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="keyvan", password="123456")
+        self.token = Token.objects.create(user=self.user).key
+        self.category = Category.objects.create(name="rent")
+        Transaction.objects.create(user=self.user, amount=200, type="I", date="2023-08-18T16:32:59.594691Z")
+        Transaction.objects.create(user=self.user, amount=50, type="E", category=self.category,
+                                   date="2023-08-19T10:00:00Z")
+        another_user = User.objects.create_user(username="another user", password="123456")
+        Transaction.objects.create(user=another_user, amount=10, type="E")
+
+    def _export(self, data):
+        return self.client.get(reverse("export-transaction"), data,
+                               headers={"Authorization": f"Token {self.token}", "Content-Type": "application/json"})
+
+    def test_export_csv(self):
+        response = self._export({})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming, "export should be streamed")
+        self.assertEqual(response["Content-Type"], "text/csv")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines, [
+            "id,amount,type,category,date",
+            f"{lines[1].split(',')[0]},200,I,,2023-08-18T16:32:59.594691Z",
+            f"{lines[2].split(',')[0]},50,E,{self.category.id},2023-08-19T10:00:00Z",
+        ])
+
+    def test_export_ndjson_matches_list_with_filters(self):
+        response = self._export({"export_format": "ndjson", "type": "E"})
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        listed = self.client.get(reverse("all-transaction"), {"type": "E"},
+                                 headers={"Authorization": f"Token {self.token}", "Content-Type": "application/json"})
+        self.assertEqual(rows, json.loads(listed.content), "export should contain the same rows as the list")
+
+    def test_export_bad_format(self):
+        response = self._export({"export_format": "xml"})
+        self.assertEqual(response.status_code, 400)